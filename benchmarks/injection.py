@@ -0,0 +1,101 @@
+"""Compare per-expansion SendInput array construction against the prebuilt pool.
+
+    python -m benchmarks.injection [--length 8] [--iterations 20000]
+
+Runs on any platform: arrays go to a stand-in for SendInput that only
+counts events, so the numbers isolate the ctypes work done per expansion.
+"""
+import argparse
+import ctypes
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from services.backends.synthetic import RecordingInjector
+from services.backends.win32 import INPUT, INPUT_KEYBOARD, KEYEVENTF_KEYUP, InputArrayPool
+
+# VK_BACK, VK_CONTROL and 'V'
+VK_MAP = {'backspace': 0x08, 'ctrl': 0x11, 'v': 0x56}
+
+
+class CountingSendInput:
+    def __init__(self):
+        self.events = 0
+
+    def __call__(self, count: int, input_array, size: int) -> int:
+        self.events += count
+        return count
+
+
+def legacy_input(vk: int, flags: int = 0) -> INPUT:
+    """Per-keystroke construction as the injector used to do it"""
+    input_struct = INPUT()
+    input_struct.type = INPUT_KEYBOARD
+    input_struct.union.ki.wVk = vk
+    input_struct.union.ki.dwFlags = flags
+    input_struct.union.ki.dwExtraInfo = ctypes.pointer(ctypes.c_ulong(0))
+    return input_struct
+
+
+def legacy_send(send_input: CountingSendInput, strokes: List[tuple]) -> None:
+    inputs = [legacy_input(vk, flags) for vk, flags in strokes]
+    input_array = (INPUT * len(inputs))(*inputs)
+    send_input(len(inputs), input_array, ctypes.sizeof(INPUT))
+
+
+def legacy_expansion(send_input: CountingSendInput, length: int) -> None:
+    backspace = [(VK_MAP['backspace'], 0), (VK_MAP['backspace'], KEYEVENTF_KEYUP)]
+    legacy_send(send_input, backspace * length)
+    legacy_send(send_input, [
+        (VK_MAP['ctrl'], 0), (VK_MAP['v'], 0),
+        (VK_MAP['v'], KEYEVENTF_KEYUP), (VK_MAP['ctrl'], KEYEVENTF_KEYUP),
+    ])
+
+
+def pooled_expansion(pool: InputArrayPool, send_input: CountingSendInput, length: int) -> None:
+    input_array = pool.backspaces_and_paste(length)
+    send_input(len(input_array), input_array, ctypes.sizeof(INPUT))
+
+
+def time_per_call(function: Callable[[], None], iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter_ns() - started) / iterations / 1000
+
+
+def run(length: int, iterations: int) -> Dict[str, float]:
+    pool = InputArrayPool(VK_MAP)
+    legacy_sink, pooled_sink = CountingSendInput(), CountingSendInput()
+    legacy_us = time_per_call(lambda: legacy_expansion(legacy_sink, length), iterations)
+    pooled_us = time_per_call(lambda: pooled_expansion(pool, pooled_sink, length), iterations)
+    if legacy_sink.events != pooled_sink.events:
+        raise AssertionError("Pooled injection sent a different number of events")
+
+    separate, combined = RecordingInjector(), RecordingInjector()
+    separate.send_backspaces(length)
+    separate.send_paste()
+    combined.send_backspaces_and_paste(length)
+    if separate.strokes != combined.strokes:
+        raise AssertionError("Combined injection changed the keystroke sequence")
+    return {
+        'legacy_us': legacy_us,
+        'pooled_us': pooled_us,
+        'speedup': legacy_us / pooled_us if pooled_us else float('inf'),
+        'legacy_send_calls': separate.batches,
+        'pooled_send_calls': combined.batches,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--length', type=int, default=8, help="Backspaces per expansion")
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args(argv)
+    for key, value in run(args.length, args.iterations).items():
+        print(f"{key:>18}: {value:.3f}" if isinstance(value, float) else f"{key:>18}: {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Replay a keystroke trace through the expansion engine against the synthetic backend.
+
+    python -m benchmarks.replay trace.ktr [--realtime] [--no-delays] [--db PATH]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from config import Config
+from services.backends.synthetic import KeyEvent, SyntheticBackend
+from services.keytrace import TraceEvent, read_trace
+
+
+def percentile(sorted_values: Sequence[int], fraction: float) -> int:
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def wait_for_drain(replacer, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        settled = replacer.expansions_processed + replacer.expansions_dropped
+        if settled >= replacer.expansions_queued and not replacer.is_replacing:
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def replay(replacer, backend: SyntheticBackend, events: List[TraceEvent],
+           realtime: bool = False, speed: float = 1.0, drain_timeout: float = 30.0) -> Dict[str, float]:
+    """Feed events into a started replacer and report throughput and callback cost"""
+    source = backend.keys
+    costs = []
+    started = time.perf_counter_ns()
+    for event in events:
+        if realtime:
+            due = started + int(event.timestamp_ns / speed)
+            delay = due - time.perf_counter_ns()
+            if delay > 0:
+                time.sleep(delay / 1e9)
+        key_event = KeyEvent(event.name, event.event_type, event.scan_code)
+        before = time.perf_counter_ns()
+        source.callback(key_event)
+        costs.append(time.perf_counter_ns() - before)
+    fed_ns = time.perf_counter_ns() - started
+    drained = wait_for_drain(replacer, drain_timeout)
+    total_ns = time.perf_counter_ns() - started
+    costs.sort()
+    stats = replacer.get_expansion_stats()
+    return {
+        'events': len(events),
+        'feed_seconds': fed_ns / 1e9,
+        'total_seconds': total_ns / 1e9,
+        'events_per_second': len(events) / (fed_ns / 1e9) if fed_ns else 0.0,
+        'callback_p50_us': percentile(costs, 0.50) / 1000,
+        'callback_p90_us': percentile(costs, 0.90) / 1000,
+        'callback_p99_us': percentile(costs, 0.99) / 1000,
+        'callback_max_us': (costs[-1] if costs else 0) / 1000,
+        'drained': drained,
+        'hook_overruns': replacer.hook_watchdog.overruns,
+        'credential_stalls': replacer.credential_rotation.stalls,
+        **stats,
+    }
+
+
+def build_replacer(db_path: Path, no_delays: bool, echo: bool = False):
+    from services.database import DatabaseManager
+    from services.text_replacer import TextReplacer
+    # Replay against a scratch copy so credential usage is not written back
+    scratch = Path(tempfile.mkdtemp(prefix='keyphraser-replay-')) / 'replacements.db'
+    if db_path.exists():
+        shutil.copyfile(db_path, scratch)
+    Config.DB_PATH = scratch
+    Config.DATA_DIR = scratch.parent
+    backend = SyntheticBackend(clipboard_text="original clipboard", echo=echo)
+    replacer = TextReplacer(DatabaseManager(), backend=backend)
+    if no_delays:
+        replacer.timing = None
+        replacer.replacement_delay = 0
+        replacer.backspace_delay = 0
+        replacer.paste_delay = 0
+        replacer.min_replacement_interval = 0
+    return replacer, backend
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace')
+    parser.add_argument('--db', default=str(Config.DB_PATH), help="Shortcut database to copy")
+    parser.add_argument('--realtime', action='store_true', help="Honour trace timestamps")
+    parser.add_argument('--speed', type=float, default=1.0, help="Realtime speed multiplier")
+    parser.add_argument('--no-delays', action='store_true', help="Zero the engine's fixed sleeps")
+    parser.add_argument('--direct-typing-max', type=int, default=Config.DIRECT_TYPING_MAX_LENGTH,
+                        help="Longest replacement typed directly rather than pasted (0 disables)")
+    parser.add_argument('--echo', action='store_true',
+                        help="Feed injected keys back through the hook like the Windows backend")
+    parser.add_argument('--latency-out', help="Write per-phase latency histograms as JSON")
+    args = parser.parse_args(argv)
+
+    events = read_trace(args.trace)
+    Config.DIRECT_TYPING_MAX_LENGTH = args.direct_typing_max
+    replacer, backend = build_replacer(Path(args.db), args.no_delays, args.echo)
+    replacer.start()
+    try:
+        report = replay(replacer, backend, events, realtime=args.realtime, speed=args.speed)
+    finally:
+        replacer.stop()
+    for key, value in report.items():
+        print(f"{key:>20}: {value:.3f}" if isinstance(value, float) else f"{key:>20}: {value}")
+    for phase, summary in replacer.get_latency_stats().items():
+        print(f"{phase:>20}: n={summary['count']} p50={summary['p50_ms']:.3f}ms "
+              f"p99={summary['p99_ms']:.3f}ms max={summary['max_ms']:.3f}ms")
+    if args.latency_out:
+        replacer.dump_latency_stats(args.latency_out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
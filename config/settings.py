@@ -84,6 +84,30 @@ class Config:
 
     MAX_BUFFER_SIZE = 50
     REPLACE_DELAY = 0.002
+    INSTANT_EXPAND = False
+    # Index, credential rings, queues and buffers together; the rings are trimmed to stay under it
+    MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+    # Key handlers slower than this are recorded by the watchdog
+    HOOK_BUDGET_US = 50
+    CREDENTIAL_FLUSH_EVERY = 10
+    CREDENTIAL_FLUSH_INTERVAL = 0.5
+    # Credentials prefetched per service; refilled in the background at the low-water mark
+    CREDENTIAL_PREFETCH_DEPTH = 8
+    CREDENTIAL_PREFETCH_LOW_WATER = 2
+    ADAPTIVE_TIMING = True
+    TIMING_SHRINK_AFTER = 5
+    # Learned delays never go below these. A settle that is too short pastes the previous
+    # clipboard contents without any error, so it keeps a wide margin; keystrokes stay
+    # ordered in the input queue, so the paste gap can go lower.
+    TIMING_FLOORS = {'settle': 0.02, 'backspace': 0.001, 'paste': 0.004, 'interval': 0.05}
+    TIMING_PROFILE_FILE = 'timing_profiles.json'
+    # Backspaces and paste go out in one SendInput once their learned gap is this small
+    COMBINED_INJECTION_MAX_DELAY = 0.005
+    # Wait after the paste keystroke before restoring the user's clipboard. Fixed, not learned:
+    # a target that reads the clipboard late raises no error, it just pastes the wrong text
+    CLIPBOARD_RESTORE_DELAY = 0.3
+    # Replacements up to this many characters are typed directly instead of pasted
+    DIRECT_TYPING_MAX_LENGTH = 32
     
     @classmethod
     def initialize(cls):
@@ -10,6 +10,7 @@ from ui.main_window import MainWindow
 from config.settings import Config
 from config.styles import Styles
 from services.database import DatabaseManager
+from services.scheduler import TaskScheduler, shared_scheduler
 from services.text_replacer import TextReplacer
 from services.system_tray import SystemTrayService
 from utils.logger import Logger
@@ -20,6 +21,7 @@ class Application:
         self.logger.info("Initializing application...")
         self.root: Optional[tk.Tk] = None
         self.db_manager: Optional[DatabaseManager] = None
+        self.scheduler: Optional[TaskScheduler] = None
         self.text_replacer: Optional[TextReplacer] = None
         self.system_tray: Optional[SystemTrayService] = None
         self.main_window: Optional[MainWindow] = None
@@ -34,7 +36,8 @@ class Application:
         if hasattr(Config, 'initialize'):
             Config.initialize()
         self.db_manager = DatabaseManager()
-        self.text_replacer = TextReplacer()
+        self.scheduler = shared_scheduler()
+        self.text_replacer = TextReplacer(self.db_manager, scheduler=self.scheduler)
         self.system_tray = SystemTrayService()
         self.root = tk.Tk()
         self.setup_window()
@@ -104,6 +107,8 @@ class Application:
                 self.text_replacer.stop()
             if self.system_tray:
                 self.system_tray.stop()
+            if self.scheduler:
+                self.scheduler.stop()
             if self.root:
                 self.root.quit()
                 self.root.destroy()
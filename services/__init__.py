@@ -1,5 +1,12 @@
 from .database import DatabaseManager
 from .text_replacer import TextReplacer
-from .system_tray import SystemTrayService
 
-__all__ = ['DatabaseManager', 'TextReplacer', 'SystemTrayService']
\ No newline at end of file
+__all__ = ['DatabaseManager', 'TextReplacer', 'SystemTrayService']
+
+
+def __getattr__(name):
+    # The tray pulls in PIL and pystray, which headless tools such as the benchmarks lack
+    if name == 'SystemTrayService':
+        from .system_tray import SystemTrayService
+        return SystemTrayService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
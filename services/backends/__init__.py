@@ -0,0 +1,14 @@
+from .base import BackendError, ClipboardBackend, ClipboardError, InputBackend, KeyEventSource, KeystrokeInjector
+from .synthetic import SyntheticBackend
+
+
+def create_default_backend() -> InputBackend:
+    """Backend for the running platform"""
+    from .win32 import Win32Backend
+    return Win32Backend()
+
+
+__all__ = [
+    'BackendError', 'ClipboardBackend', 'ClipboardError', 'InputBackend', 'KeyEventSource', 'KeystrokeInjector',
+    'SyntheticBackend', 'create_default_backend'
+]
@@ -0,0 +1,108 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# (key name, is key-up) as understood by the keyboard library
+KeyStroke = Tuple[str, bool]
+
+PASTE_STROKES: List[KeyStroke] = [('ctrl', False), ('v', False), ('v', True), ('ctrl', True)]
+
+
+class KeyEventSource(ABC):
+    """Delivers global key events to a callback"""
+
+    @abstractmethod
+    def hook(self, callback: Callable[[Any], None]) -> None:
+        pass
+
+    @abstractmethod
+    def unhook(self) -> None:
+        pass
+
+    def input_idle_time(self) -> Optional[float]:
+        """Seconds since the system last saw user input, if the platform reports it"""
+        return None
+
+    def send_probe(self) -> bool:
+        """Inject a key no application acts on, for the hook to see; False if unsupported"""
+        return False
+
+    def is_probe(self, event: Any) -> bool:
+        return False
+
+    def reinstall(self) -> None:
+        """Replace the OS-level hook; registered callbacks stay hooked"""
+
+
+class KeystrokeInjector(ABC):
+    """Sends synthetic keystrokes to the focused application"""
+
+    # Whether injected virtual-key events come back through the key hook
+    echoes_injected_keys = False
+
+    @abstractmethod
+    def send_keys(self, strokes: Sequence[KeyStroke]) -> None:
+        pass
+
+    def send_backspaces(self, count: int) -> None:
+        self.send_keys([('backspace', up) for _ in range(count) for up in (False, True)])
+
+    def send_paste(self) -> None:
+        self.send_keys(PASTE_STROKES)
+
+    supports_unicode = False
+
+    def type_text(self, text: str) -> None:
+        """Inject text as Unicode key events, independent of keyboard layout"""
+        raise BackendError("Direct text injection is not supported")
+
+    def send_backspaces_and_text(self, count: int, text: str) -> None:
+        self.send_backspaces(count)
+        self.type_text(text)
+
+    def send_backspaces_and_paste(self, count: int) -> None:
+        """Erase and paste in one injection, with no gap for the target to react"""
+        self.send_keys([('backspace', up) for _ in range(count) for up in (False, True)] + PASTE_STROKES)
+
+    def foreground_app(self) -> Optional[str]:
+        """Identifier of the application receiving input, if it can be determined"""
+        return None
+
+    def attach(self) -> None:
+        """Prepare to inject into the current foreground window"""
+
+    def detach(self) -> None:
+        """Undo attach"""
+
+
+class ClipboardBackend(ABC):
+    """Single-attempt clipboard access; callers own retries"""
+
+    @abstractmethod
+    def get_text(self) -> Optional[str]:
+        """Clipboard text, or None when no text is on the clipboard"""
+        pass
+
+    @abstractmethod
+    def set_text(self, text: str) -> None:
+        pass
+
+    def sequence_number(self) -> Optional[int]:
+        """Counter that advances on every clipboard change, or None if unsupported"""
+        return None
+
+
+class InputBackend:
+    """Key source, injector and clipboard used together by the engine"""
+
+    def __init__(self, keys: KeyEventSource, injector: KeystrokeInjector, clipboard: ClipboardBackend):
+        self.keys = keys
+        self.injector = injector
+        self.clipboard = clipboard
+
+
+class BackendError(Exception):
+    pass
+
+
+class ClipboardError(BackendError):
+    """The clipboard stayed unavailable through every retry"""
@@ -0,0 +1,164 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from services.backends.base import (
+    BackendError, ClipboardBackend, InputBackend, KeyEventSource, KeyStroke, KeystrokeInjector
+)
+
+# What the keyboard library reports for the Win32 probe key, which has no scan code
+PROBE_SCAN_CODE = -0xE8
+
+
+@dataclass
+class KeyEvent:
+    """Minimal stand-in for keyboard.KeyboardEvent"""
+    name: str
+    event_type: str = 'down'
+    scan_code: int = 0
+    time: float = field(default_factory=time.time)
+
+
+class SyntheticKeySource(KeyEventSource):
+    """Key events are pushed by the caller instead of an OS hook"""
+
+    def __init__(self):
+        self.callback: Optional[Callable[[Any], None]] = None
+        self.last_input: Optional[float] = None
+        # Set by drop_hook(): events stop reaching the callback until reinstall()
+        self.dropped = False
+        self.probes = 0
+        # Echoes arrive from the injecting thread; callbacks still run one at a time like the
+        # keyboard library's dispatch thread
+        self._lock = threading.Lock()
+
+    def hook(self, callback: Callable[[Any], None]) -> None:
+        self.callback = callback
+
+    def unhook(self) -> None:
+        self.callback = None
+
+    def input_idle_time(self) -> Optional[float]:
+        if self.last_input is None:
+            return None
+        return time.monotonic() - self.last_input
+
+    def send_probe(self) -> bool:
+        self.probes += 1
+        self.feed('probe', 'down', PROBE_SCAN_CODE)
+        self.feed('probe', 'up', PROBE_SCAN_CODE)
+        return True
+
+    def is_probe(self, event: Any) -> bool:
+        return event.scan_code == PROBE_SCAN_CODE
+
+    def drop_hook(self) -> None:
+        """Simulate Windows removing a hook that overran LowLevelHooksTimeout"""
+        self.dropped = True
+
+    def reinstall(self) -> None:
+        self.dropped = False
+
+    def feed(self, name: str, event_type: str = 'down', scan_code: int = 0) -> None:
+        with self._lock:
+            self.last_input = time.monotonic()
+            if self.callback and not self.dropped:
+                self.callback(KeyEvent(name, event_type, scan_code))
+
+    def type_text(self, text: str) -> None:
+        """Press and release each character; spaces and newlines use their key names"""
+        for char in text:
+            name = {' ': 'space', '\n': 'enter'}.get(char, char)
+            self.feed(name, 'down')
+            self.feed(name, 'up')
+
+
+class RecordingInjector(KeystrokeInjector):
+    """Records injected keystrokes in order, optionally echoing them to a key source like a real hook"""
+
+    def __init__(self, echo: Optional[SyntheticKeySource] = None):
+        self.strokes: List[KeyStroke] = []
+        self.typed: List[str] = []
+        self.batches = 0
+        self.foreground: Optional[str] = None
+        self.echo = echo
+        self.echoes_injected_keys = echo is not None
+
+    supports_unicode = True
+
+    def _echo(self, strokes: Sequence[KeyStroke]) -> None:
+        if self.echo:
+            for name, up in strokes:
+                self.echo.feed(name, 'up' if up else 'down')
+
+    def _text_strokes(self, text: str) -> List[KeyStroke]:
+        # Unicode events never reach the hook, except Enter sent for newlines
+        return [('enter', up) for _ in range(text.count('\n')) for up in (False, True)]
+
+    def send_keys(self, strokes: Sequence[KeyStroke]) -> None:
+        self.batches += 1
+        self.strokes.extend(strokes)
+        self._echo(strokes)
+
+    def type_text(self, text: str) -> None:
+        self.batches += 1
+        self.typed.append(text)
+        self._echo(self._text_strokes(text))
+
+    def send_backspaces_and_text(self, count: int, text: str) -> None:
+        self.batches += 1
+        backspaces = [('backspace', up) for _ in range(count) for up in (False, True)]
+        self.strokes.extend(backspaces)
+        self.typed.append(text)
+        self._echo(backspaces + self._text_strokes(text))
+
+    def foreground_app(self) -> Optional[str]:
+        return self.foreground
+
+    def clear(self) -> None:
+        self.strokes.clear()
+        self.typed.clear()
+        self.batches = 0
+
+
+class MemoryClipboard(ClipboardBackend):
+    """In-process clipboard that logs every operation and can simulate failures"""
+
+    def __init__(self, text: Optional[str] = None):
+        self.text = text
+        self.sequence = 0
+        self.operations: List[Tuple[str, str]] = []
+        self.fail_reads = 0
+        self.fail_writes = 0
+
+    def get_text(self) -> Optional[str]:
+        if self.fail_reads:
+            self.fail_reads -= 1
+            raise BackendError("Simulated clipboard read failure")
+        self.operations.append(('get', self.text))
+        return self.text
+
+    def set_text(self, text: str) -> None:
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise BackendError("Simulated clipboard write failure")
+        self.operations.append(('set', text))
+        self.text = text
+        self.sequence += 1
+
+    def sequence_number(self) -> Optional[int]:
+        return self.sequence
+
+    def copy(self, text: str) -> None:
+        """Simulate another application putting text on the clipboard"""
+        self.operations.append(('copy', text))
+        self.text = text
+        self.sequence += 1
+
+
+class SyntheticBackend(InputBackend):
+    """Deterministic backend for benchmarks and profiling on any platform"""
+
+    def __init__(self, clipboard_text: Optional[str] = None, echo: bool = False):
+        keys = SyntheticKeySource()
+        super().__init__(keys, RecordingInjector(keys if echo else None), MemoryClipboard(clipboard_text))
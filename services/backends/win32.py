@@ -0,0 +1,338 @@
+import ctypes
+import ntpath
+import threading
+from ctypes import wintypes
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from services.backends.base import (
+    BackendError, ClipboardBackend, InputBackend, KeyEventSource, KeyStroke, KeystrokeInjector
+)
+
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+INPUT_KEYBOARD = 1
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+WM_USER = 0x0400
+# Unassigned virtual key: applications ignore it, but the low-level hook still sees it
+PROBE_VK = 0xE8
+# Covers the longest shortcut plus its delimiter
+POOLED_BACKSPACES = 64
+
+# Windows API Structures
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
+    ]
+
+class INPUT_UNION(ctypes.Union):
+    _fields_ = [
+        ("ki", KEYBDINPUT),
+        ("padding", ctypes.c_byte * 32)
+    ]
+
+class INPUT(ctypes.Structure):
+    _fields_ = [
+        ("type", wintypes.DWORD),
+        ("union", INPUT_UNION)
+    ]
+
+class LASTINPUTINFO(ctypes.Structure):
+    _fields_ = [
+        ("cbSize", wintypes.UINT),
+        ("dwTime", wintypes.DWORD)
+    ]
+
+# Every injected event shares one zero extra-info value instead of allocating its own
+_NO_EXTRA_INFO = ctypes.pointer(ctypes.c_ulong(0))
+
+
+def build_input_array(events: Sequence[Tuple[int, ...]]) -> ctypes.Array:
+    """SendInput array for (virtual key, flags) or (virtual key, flags, scan) events"""
+    input_array = (INPUT * len(events))()
+    for slot, (vk, flags, *scan) in zip(input_array, events):
+        slot.type = INPUT_KEYBOARD
+        slot.union.ki.wVk = vk
+        slot.union.ki.dwFlags = flags
+        if scan:
+            slot.union.ki.wScan = scan[0]
+        slot.union.ki.dwExtraInfo = _NO_EXTRA_INFO
+    return input_array
+
+
+def text_events(text: str, enter_vk: int) -> List[Tuple[int, int, int]]:
+    """KEYEVENTF_UNICODE down/up events per UTF-16 code unit of text"""
+    events = []
+    for char in text.replace('\r\n', '\n'):
+        if char == '\n':
+            # Many edit controls ignore a Unicode newline; press Enter instead
+            events.append((enter_vk, 0, 0))
+            events.append((enter_vk, KEYEVENTF_KEYUP, 0))
+            continue
+        data = char.encode('utf-16-le')
+        for offset in range(0, len(data), 2):
+            unit = data[offset] | (data[offset + 1] << 8)
+            events.append((0, KEYEVENTF_UNICODE, unit))
+            events.append((0, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP, unit))
+    return events
+
+
+class InputArrayPool:
+    """SendInput arrays for backspace runs and the paste chord, built once.
+
+    The arrays are never modified after construction, so an expansion hands
+    one straight to SendInput without any ctypes allocation.
+    """
+
+    def __init__(self, vk_map: Dict[str, int], max_backspaces: int = POOLED_BACKSPACES):
+        backspace = [(vk_map['backspace'], 0), (vk_map['backspace'], KEYEVENTF_KEYUP)]
+        paste = [
+            (vk_map['ctrl'], 0), (vk_map['v'], 0),
+            (vk_map['v'], KEYEVENTF_KEYUP), (vk_map['ctrl'], KEYEVENTF_KEYUP),
+        ]
+        self.max_backspaces = max_backspaces
+        self.paste = build_input_array(paste)
+        self._backspace_runs = [build_input_array(backspace * count) for count in range(max_backspaces + 1)]
+        self._combined = [build_input_array(backspace * count + paste) for count in range(max_backspaces + 1)]
+        self.backspace_events = backspace
+        self._paste_events = paste
+
+    def backspaces(self, count: int) -> ctypes.Array:
+        if count <= self.max_backspaces:
+            return self._backspace_runs[count]
+        return build_input_array(self.backspace_events * count)
+
+    def backspaces_and_paste(self, count: int) -> ctypes.Array:
+        if count <= self.max_backspaces:
+            return self._combined[count]
+        return build_input_array(self.backspace_events * count + self._paste_events)
+
+
+def initialize_vk_map() -> Dict[str, int]:
+    import win32con
+    vk_map = {}
+    for i in range(26):
+        vk_map[chr(65 + i).lower()] = ord('A') + i
+    for i in range(10):
+        vk_map[str(i)] = ord('0') + i
+    navigation_keys = {
+        'left': win32con.VK_LEFT,
+        'right': win32con.VK_RIGHT,
+        'up': win32con.VK_UP,
+        'down': win32con.VK_DOWN,
+        'home': win32con.VK_HOME,
+        'end': win32con.VK_END,
+        'page_up': win32con.VK_PRIOR,
+        'page_down': win32con.VK_NEXT
+    }
+    control_keys = {
+        'backspace': win32con.VK_BACK,
+        'tab': win32con.VK_TAB,
+        'return': win32con.VK_RETURN,
+        'enter': win32con.VK_RETURN,
+        'shift': win32con.VK_SHIFT,
+        'ctrl': win32con.VK_CONTROL,
+        'alt': win32con.VK_MENU,
+        'pause': win32con.VK_PAUSE,
+        'caps_lock': win32con.VK_CAPITAL,
+        'escape': win32con.VK_ESCAPE,
+        'space': win32con.VK_SPACE,
+        'delete': win32con.VK_DELETE,
+        'insert': win32con.VK_INSERT
+    }
+    for i in range(1, 13):
+        control_keys[f'f{i}'] = getattr(win32con, f'VK_F{i}')
+    vk_map.update(navigation_keys)
+    vk_map.update(control_keys)
+    return vk_map
+
+
+class Win32KeyEventSource(KeyEventSource):
+    """Global low-level hook through the keyboard library.
+
+    The library installs one WH_KEYBOARD_LL hook from its listening thread
+    and queues each event for a separate dispatch thread that runs the
+    callbacks. hook() and unhook() only add and remove callbacks; Windows
+    silently removes the OS hook itself when it overruns LowLevelHooksTimeout,
+    which only reinstall() repairs.
+    """
+
+    def __init__(self):
+        import keyboard
+        self._keyboard = keyboard
+        self._hook = None
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self.kernel32.GetTickCount.restype = wintypes.DWORD
+        self._last_input = LASTINPUTINFO(ctypes.sizeof(LASTINPUTINFO), 0)
+        self._probe = build_input_array([(PROBE_VK, 0), (PROBE_VK, KEYEVENTF_KEYUP)])
+
+    def hook(self, callback: Callable[[Any], None]) -> None:
+        self._hook = self._keyboard.hook(callback)
+
+    def unhook(self) -> None:
+        # Only our own hook; hotkeys registered through the same library stay active
+        if self._hook is not None:
+            self._keyboard.unhook(self._hook)
+            self._hook = None
+
+    def input_idle_time(self) -> Optional[float]:
+        if not self.user32.GetLastInputInfo(ctypes.byref(self._last_input)):
+            return None
+        # Both are 32-bit millisecond tick counts; the mask handles wraparound
+        return ((self.kernel32.GetTickCount() - self._last_input.dwTime) & 0xFFFFFFFF) / 1000
+
+    def send_probe(self) -> bool:
+        return self.user32.SendInput(len(self._probe), self._probe, ctypes.sizeof(INPUT)) == len(self._probe)
+
+    def is_probe(self, event: Any) -> bool:
+        # The library reports a key without a scan code as -vk
+        return event.scan_code == -PROBE_VK
+
+    def reinstall(self) -> None:
+        listener = self._keyboard._listener
+        with listener.lock:
+            if not listener.listening:
+                return
+            old = listener.listening_thread
+            if old is not None and old.is_alive():
+                # The library loops `while not GetMessage(...)`: WM_QUIT makes GetMessage return 0
+                # and keeps it looping, any other message ends the loop. Windows removes the
+                # hook along with the thread that installed it.
+                if not self.user32.PostThreadMessageW(old.native_id, WM_USER, 0, 0):
+                    raise BackendError("Failed to signal the keyboard listener thread")
+                old.join(timeout=1.0)
+                if old.is_alive():
+                    raise BackendError("Keyboard listener thread did not exit")
+            # listen() installs a new hook on the new thread; the dispatch thread and its
+            # queue of callbacks are kept
+            thread = threading.Thread(target=listener.listen, daemon=True)
+            listener.listening_thread = thread
+            thread.start()
+
+
+class Win32KeystrokeInjector(KeystrokeInjector):
+    """SendInput-based injection"""
+
+    # The low-level hook sees our virtual keys; KEYEVENTF_UNICODE (VK_PACKET) events are skipped
+    echoes_injected_keys = True
+
+    def __init__(self):
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self.vk_map = initialize_vk_map()
+        self.pool = InputArrayPool(self.vk_map)
+
+    def send_input_array(self, input_array: ctypes.Array) -> None:
+        num_inputs = len(input_array)
+        if not num_inputs:
+            return
+        result = self.user32.SendInput(num_inputs, input_array, ctypes.sizeof(INPUT))
+        if result != num_inputs:
+            error = ctypes.get_last_error()
+            raise BackendError(f"SendInput failed with error: {error}")
+
+    def send_keys(self, strokes: Sequence[KeyStroke]) -> None:
+        self.send_input_array(build_input_array([
+            (self.vk_map[name], KEYEVENTF_KEYUP if up else 0) for name, up in strokes
+        ]))
+
+    def send_backspaces(self, count: int) -> None:
+        self.send_input_array(self.pool.backspaces(count))
+
+    def send_paste(self) -> None:
+        self.send_input_array(self.pool.paste)
+
+    def send_backspaces_and_paste(self, count: int) -> None:
+        self.send_input_array(self.pool.backspaces_and_paste(count))
+
+    supports_unicode = True
+
+    def type_text(self, text: str) -> None:
+        self.send_input_array(build_input_array(text_events(text, self.vk_map['enter'])))
+
+    def send_backspaces_and_text(self, count: int, text: str) -> None:
+        backspace = self.pool.backspace_events
+        self.send_input_array(build_input_array(backspace * count + text_events(text, self.vk_map['enter'])))
+
+    def _foreground_threads(self):
+        foreground_window = self.user32.GetForegroundWindow()
+        if not foreground_window:
+            return None
+        target_thread = self.user32.GetWindowThreadProcessId(foreground_window, None)
+        current_thread = self.kernel32.GetCurrentThreadId()
+        return current_thread, target_thread
+
+    def foreground_app(self) -> Optional[str]:
+        foreground_window = self.user32.GetForegroundWindow()
+        if not foreground_window:
+            return None
+        pid = ctypes.c_ulong(0)
+        self.user32.GetWindowThreadProcessId(foreground_window, ctypes.byref(pid))
+        process = self.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid.value)
+        if not process:
+            return None
+        try:
+            size = ctypes.c_ulong(260)
+            buffer = ctypes.create_unicode_buffer(size.value)
+            if not self.kernel32.QueryFullProcessImageNameW(process, 0, buffer, ctypes.byref(size)):
+                return None
+            return ntpath.basename(buffer.value).lower()
+        finally:
+            self.kernel32.CloseHandle(process)
+
+    def attach(self) -> None:
+        threads = self._foreground_threads()
+        if threads:
+            self.user32.AttachThreadInput(threads[0], threads[1], True)
+
+    def detach(self) -> None:
+        threads = self._foreground_threads()
+        if threads:
+            self.user32.AttachThreadInput(threads[0], threads[1], False)
+
+
+class Win32Clipboard(ClipboardBackend):
+    """CF_UNICODETEXT access through pywin32"""
+
+    def __init__(self):
+        import win32clipboard
+        import win32con
+        self._clipboard = win32clipboard
+        self._format = win32con.CF_UNICODETEXT
+
+    def _close_quietly(self) -> None:
+        try:
+            self._clipboard.CloseClipboard()
+        except Exception:
+            pass
+
+    def get_text(self) -> Optional[str]:
+        self._close_quietly()
+        try:
+            self._clipboard.OpenClipboard(None)
+            if self._clipboard.IsClipboardFormatAvailable(self._format):
+                return self._clipboard.GetClipboardData(self._format)
+            return None
+        finally:
+            self._close_quietly()
+
+    def set_text(self, text: str) -> None:
+        self._close_quietly()
+        try:
+            self._clipboard.OpenClipboard(None)
+            self._clipboard.EmptyClipboard()
+            self._clipboard.SetClipboardText(text, self._format)
+        finally:
+            self._close_quietly()
+
+    def sequence_number(self) -> Optional[int]:
+        # Needs no OpenClipboard, so it is cheap and never contends with other apps
+        return self._clipboard.GetClipboardSequenceNumber()
+
+
+class Win32Backend(InputBackend):
+    def __init__(self):
+        super().__init__(Win32KeyEventSource(), Win32KeystrokeInjector(), Win32Clipboard())
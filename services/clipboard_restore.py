@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+from services.scheduler import ScheduledTask, TaskScheduler, shared_scheduler
+
+
+class PendingRestore(NamedTuple):
+    text: str
+    # Clipboard sequence number right after the replacement was written
+    sequence: Optional[int]
+    due: float
+    app: Optional[str] = None
+    # The paste went out; an undisturbed clipboard at restore time confirms its timing
+    pasted: bool = False
+
+
+class DeferredClipboardRestore:
+    """Puts the user's clipboard back after the target application has pasted.
+
+    At most one restore is pending. A new expansion that starts before it
+    runs takes it over with take(), reusing its text as the original
+    clipboard, so back-to-back expansions only restore once at the end.
+    Restores run under the engine's clipboard lock, so a pending restore is
+    either taken by the next expansion or has already completed.
+    """
+
+    def __init__(self, restore: Callable[[PendingRestore], None], lock: threading.Lock,
+                 scheduler: Optional[TaskScheduler] = None):
+        self.restore = restore
+        self.lock = lock
+        self.scheduler = scheduler or shared_scheduler()
+        self._guard = threading.Lock()
+        self._pending: Optional[PendingRestore] = None
+        self._task: Optional[ScheduledTask] = None
+        self.scheduled = 0
+        self.coalesced = 0
+        self.completed = 0
+
+    def stop(self) -> None:
+        """Restore right away rather than leave the replacement on the clipboard"""
+        self.flush()
+
+    def schedule(self, text: str, sequence: Optional[int], delay: float, app: Optional[str] = None,
+                 pasted: bool = False) -> None:
+        with self._guard:
+            if self._task:
+                self._task.cancel()
+            self._pending = PendingRestore(text, sequence, time.monotonic() + delay, app, pasted)
+            self.scheduled += 1
+            self._task = self.scheduler.call_later(
+                delay, self._run_due, name='clipboard-restore', background=True
+            )
+
+    def take(self) -> Optional[PendingRestore]:
+        """Cancel the pending restore and return it; call with the clipboard lock held"""
+        with self._guard:
+            pending, self._pending = self._pending, None
+            if self._task:
+                self._task.cancel()
+                self._task = None
+            if pending is not None:
+                self.coalesced += 1
+            return pending
+
+    def flush(self) -> None:
+        """Run the pending restore now"""
+        with self.lock:
+            with self._guard:
+                pending, self._pending = self._pending, None
+                if self._task:
+                    self._task.cancel()
+                    self._task = None
+            if pending is not None:
+                self._restore(pending)
+
+    def _restore(self, pending: PendingRestore) -> None:
+        self.restore(pending)
+        self.completed += 1
+
+    def _run_due(self) -> None:
+        with self.lock:
+            with self._guard:
+                pending = self._pending
+                # Taken by an expansion or rescheduled while we waited for the lock
+                if pending is None or pending.due > time.monotonic():
+                    return
+                self._pending = None
+                self._task = None
+            self._restore(pending)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._guard:
+            return {
+                'pending': int(self._pending is not None),
+                'scheduled': self.scheduled,
+                'coalesced': self.coalesced,
+                'completed': self.completed,
+            }
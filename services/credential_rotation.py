@@ -0,0 +1,307 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from config import Config
+from services.memory import deep_sizeof
+from services.scheduler import ScheduledTask, TaskScheduler, shared_scheduler
+from utils.logger import Logger
+
+
+class ServiceRotation:
+    """Credentials of one service in position order and the next one to dispense"""
+
+    __slots__ = ('service_id', 'ids', 'contents', 'cursor')
+
+    def __init__(self, service_id: int, rows: List[Tuple[int, str]], last_used_id: Optional[int]):
+        self.service_id = service_id
+        self.ids = [row[0] for row in rows]
+        self.contents = [row[1] for row in rows]
+        self.cursor = 0
+        if last_used_id in self.ids:
+            self.cursor = (self.ids.index(last_used_id) + 1) % len(self.ids)
+
+    def advance(self) -> Optional[Tuple[int, str]]:
+        if not self.ids:
+            return None
+        index = self.cursor
+        self.cursor = (index + 1) % len(self.ids)
+        return self.ids[index], self.contents[index]
+
+
+class CredentialRotation:
+    """Dispenses credentials from in-memory cursors and persists usage write-behind.
+
+    last_used updates are journaled and flushed by a scheduled job after
+    flush_every dispenses or flush_interval seconds, whichever comes first;
+    that is the most a crash can lose.
+
+    Each service keeps a prefetch ring of its next prefetch_depth credentials,
+    topped up by a scheduled job once it drops to low_water, so a dispense is
+    a pop and only a service that was never loaded waits on the database.
+    Cursors advance when credentials are prefetched, but usage is journaled
+    only when they are dispensed; dropping a ring therefore loses nothing, and
+    a reload resumes right after the last credential actually handed out. A
+    credential that could not be delivered is given back and dispensed next.
+    """
+
+    def __init__(self, db, scheduler: Optional[TaskScheduler] = None,
+                 flush_every: int = Config.CREDENTIAL_FLUSH_EVERY,
+                 flush_interval: float = Config.CREDENTIAL_FLUSH_INTERVAL,
+                 content_filter: Optional[Callable[[str], bool]] = None,
+                 prefetch_depth: int = Config.CREDENTIAL_PREFETCH_DEPTH,
+                 low_water: int = Config.CREDENTIAL_PREFETCH_LOW_WATER):
+        self.db = db
+        # Applied once when a service's credentials are loaded, never per dispense
+        self.content_filter = content_filter
+        self.scheduler = scheduler or shared_scheduler()
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.prefetch_depth = max(1, prefetch_depth)
+        self.low_water = min(low_water, self.prefetch_depth - 1)
+        self.logger = Logger(__name__)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._rotations: Dict[int, ServiceRotation] = {}
+        self._rings: Dict[int, Deque[Tuple[int, str]]] = {}
+        self._refilling: Set[int] = set()
+        # Bumped by invalidate so a refill that loaded stale rows retries
+        self._generation = 0
+        self._pending: List[Tuple[str, int, int]] = []
+        self._flush_task: Optional[ScheduledTask] = None
+        self._running = False
+        self.dispensed = 0
+        self.returned = 0
+        self.flushed = 0
+        self.stalls = 0
+        self.sync_loads = 0
+        self.refills = 0
+
+    def start(self) -> None:
+        with self._lock:
+            self._running = True
+            if self._pending:
+                self._schedule_flush(self.flush_interval)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._running = False
+            if self._flush_task:
+                self._flush_task.cancel()
+                self._flush_task = None
+        self.flush()
+
+    def take(self, service_id: int) -> Optional[Tuple[int, str]]:
+        """Next (id, content) of a service; the index resolves trigger shortcuts to service ids"""
+        with self._lock:
+            ring = self._rings.get(service_id)
+            if not ring:
+                rotation = self._rotations.get(service_id)
+                if rotation is None:
+                    # Never prefetched: the one dispense path that waits on the database
+                    self.sync_loads += 1
+                    rotation = self._rotations[service_id] = self._load(service_id)
+                if rotation.ids:
+                    self.stalls += 1
+                ring = self._top_up(service_id, rotation)
+                if not ring:
+                    return None
+            credential = ring.popleft()
+            credential_id = credential[0]
+            if len(ring) <= self.low_water:
+                self._schedule_refill(service_id)
+            # Microsecond UTC stamps keep same-second dispenses ordered on reload
+            used_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+            self._pending.append((used_at, credential_id, service_id))
+            self.dispensed += 1
+            if self._running:
+                if len(self._pending) >= self.flush_every:
+                    self._schedule_flush(0)
+                elif len(self._pending) == 1:
+                    self._schedule_flush(self.flush_interval)
+            return credential
+
+    def give_back(self, service_id: int, credential: Tuple[int, str]) -> None:
+        """Undo a take whose credential was never delivered, so it is dispensed next"""
+        with self._lock:
+            credential_id = credential[0]
+            for index in range(len(self._pending) - 1, -1, -1):
+                if self._pending[index][1] == credential_id:
+                    del self._pending[index]
+                    break
+            self.dispensed -= 1
+            self.returned += 1
+            ring = self._rings.get(service_id)
+            rotation = self._rotations.get(service_id)
+            # A reload since the take decides again whether the credential still exists
+            if ring is not None and rotation is not None and credential_id in rotation.ids:
+                ring.appendleft(credential)
+
+    def prefetch(self, service_ids: Iterable[int]) -> None:
+        """Fill the rings of the given services in the background"""
+        with self._lock:
+            for service_id in service_ids:
+                ring = self._rings.get(service_id)
+                if ring is None or len(ring) <= self.low_water:
+                    self._schedule_refill(service_id)
+
+    def _load(self, service_id: int) -> ServiceRotation:
+        rows, last_used_id = self.db.get_credential_rotation(service_id)
+        rows = self._valid_rows(service_id, rows)
+        return ServiceRotation(service_id, rows, last_used_id)
+
+    def _top_up(self, service_id: int, rotation: ServiceRotation) -> Deque[Tuple[int, str]]:
+        """Advance the cursor until the ring is full; call with _lock held"""
+        ring = self._rings.get(service_id)
+        if ring is None:
+            ring = self._rings[service_id] = deque()
+        if rotation.ids:
+            while len(ring) < self.prefetch_depth:
+                ring.append(rotation.advance())
+        return ring
+
+    def _schedule_refill(self, service_id: int) -> None:
+        """Queue one background refill per service; call with _lock held"""
+        if service_id in self._refilling:
+            return
+        self._refilling.add(service_id)
+        self.scheduler.call_later(
+            0, lambda: self._refill(service_id), name='credential-prefetch', background=True
+        )
+
+    def _refill(self, service_id: int) -> None:
+        with self._lock:
+            self._refilling.discard(service_id)
+            rotation = self._rotations.get(service_id)
+            generation = self._generation
+        if rotation is None:
+            # Read outside the lock so dispenses of other services carry on
+            try:
+                rotation = self._load(service_id)
+            except Exception as e:
+                self.logger.error(f"Failed to prefetch credentials of service {service_id}: {e}")
+                return
+        with self._lock:
+            if generation != self._generation:
+                self._schedule_refill(service_id)
+                return
+            rotation = self._rotations.setdefault(service_id, rotation)
+            self._top_up(service_id, rotation)
+            self.refills += 1
+
+    def _valid_rows(self, service_id: int, rows: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        if self.content_filter is None:
+            return rows
+        valid = [row for row in rows if self.content_filter(row[1])]
+        if len(valid) != len(rows):
+            self.logger.warning(
+                f"Skipping {len(rows) - len(valid)} invalid credentials of service {service_id}"
+            )
+        return valid
+
+    def _schedule_flush(self, delay: float) -> None:
+        """Make sure a flush runs within delay seconds; call with _lock held"""
+        task = self._flush_task
+        if task is not None and not task.cancelled:
+            if task.due <= time.monotonic() + delay:
+                return
+            task.cancel()
+        self._flush_task = self.scheduler.call_later(
+            delay, self._scheduled_flush, name='credential-flush', background=True
+        )
+
+    def _scheduled_flush(self) -> None:
+        with self._lock:
+            self._flush_task = None
+        self.flush()
+
+    def invalidate(self, service_id: Optional[int] = None, usage_reset: bool = False) -> None:
+        """Drop cached rotations and rings after credentials change, then prefetch again"""
+        # The flush lock first waits out a flush whose batch is not in the database yet
+        with self._flush_lock, self._lock:
+            if usage_reset:
+                self._pending = [
+                    entry for entry in self._pending
+                    if service_id is not None and entry[2] != service_id
+                ]
+            else:
+                # Persisted in the same critical section that drops the rings, so no dispense
+                # slips in between and the reload resumes right after the last one
+                self._persist_locked()
+            self._generation += 1
+            if service_id is None:
+                dropped = list(self._rings)
+                self._rotations.clear()
+                self._rings.clear()
+            else:
+                dropped = [service_id] if self._rings.pop(service_id, None) is not None else []
+                self._rotations.pop(service_id, None)
+            for dropped_id in dropped:
+                self._schedule_refill(dropped_id)
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            if not self._write(batch):
+                with self._lock:
+                    self._requeue(batch)
+
+    def _persist_locked(self) -> None:
+        """Write the whole journal while dispenses wait; call with both locks held"""
+        batch, self._pending = self._pending, []
+        if batch and not self._write(batch):
+            self._requeue(batch)
+
+    def _write(self, batch: List[Tuple[str, int, int]]) -> bool:
+        try:
+            self.db.mark_credentials_used([(used_at, credential_id) for used_at, credential_id, _ in batch])
+            self.flushed += len(batch)
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to persist credential usage: {e}")
+            return False
+
+    def _requeue(self, batch: List[Tuple[str, int, int]]) -> None:
+        """Put a batch that failed to write back in front of the journal; call with _lock held"""
+        self._pending = batch + self._pending
+        if self._running:
+            self._schedule_flush(self.flush_interval)
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'services_loaded': len(self._rotations),
+                'pending_writes': len(self._pending),
+                'dispensed': self.dispensed,
+                'returned': self.returned,
+                'flushed': self.flushed,
+                'prefetch_depth': self.prefetch_depth,
+                'ring_depth': {service_id: len(ring) for service_id, ring in self._rings.items()},
+                'stalls': self.stalls,
+                'sync_loads': self.sync_loads,
+                'refills': self.refills,
+            }
+
+    def measure(self) -> int:
+        with self._lock:
+            return deep_sizeof((self._rotations, self._rings, self._pending))
+
+    def trim(self, target_bytes: int) -> int:
+        """Unload services, oldest loaded first, until the rest fit target_bytes; returns bytes freed"""
+        with self._flush_lock, self._lock:
+            # Persist dispenses first so an unloaded service reloads right after them
+            self._persist_locked()
+            size = deep_sizeof((self._rotations, self._rings, self._pending))
+            freed = 0
+            for service_id in list(self._rotations):
+                if size - freed <= target_bytes:
+                    break
+                freed += deep_sizeof((self._rotations.pop(service_id), self._rings.pop(service_id, None)))
+            if freed:
+                # A refill already in flight must not put an unloaded rotation back
+                self._generation += 1
+            return freed
@@ -1,14 +1,75 @@
 import sqlite3
-from typing import Dict, List, Tuple, Optional
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, Optional
 from config import Config
 class DatabaseManager:
+    # Process-wide connection metrics and the schemas already set up
+    _stats_lock = threading.Lock()
+    _initialized_paths = set()
+    connections_opened = 0
+    connections_closed = 0
+    total_connect_time = 0.0
+    last_connect_time = 0.0
+
     def __init__(self):
         self.db_path = Config.DB_PATH
+        # One connection is shared by the UI and the replacement worker
+        self._lock = threading.RLock()
+        # Called with (service_id or None for all, usage_reset) after credential writes
+        self.on_credentials_changed: Optional[Callable[[Optional[int], bool], None]] = None
+        # Called after the services table changes
+        self.on_services_changed: Optional[Callable[[], None]] = None
+        started = time.perf_counter()
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
-        self.initialize_db()
-        self.initialize_services()
+        self.closed = False
+        with DatabaseManager._stats_lock:
+            needs_schema = str(self.db_path) not in DatabaseManager._initialized_paths
+            if needs_schema:
+                self.initialize_db()
+                self.initialize_services()
+                DatabaseManager._initialized_paths.add(str(self.db_path))
+            elapsed = time.perf_counter() - started
+            DatabaseManager.connections_opened += 1
+            DatabaseManager.total_connect_time += elapsed
+            DatabaseManager.last_connect_time = elapsed
+
+    @classmethod
+    def get_connection_stats(cls) -> Dict[str, float]:
+        """Connection count and setup time across the process"""
+        with cls._stats_lock:
+            return {
+                'connections_opened': cls.connections_opened,
+                'open_connections': cls.connections_opened - cls.connections_closed,
+                'total_connect_ms': cls.total_connect_time * 1000,
+                'last_connect_ms': cls.last_connect_time * 1000,
+            }
+
+    def close(self):
+        """Close the connection"""
+        with self._lock:
+            if self.closed:
+                return
+            self.conn.close()
+            self.closed = True
+        with DatabaseManager._stats_lock:
+            DatabaseManager.connections_closed += 1
+
 
+    def _credentials_changed(self, service_id: Optional[int] = None, usage_reset: bool = False):
+        if self.on_credentials_changed:
+            try:
+                self.on_credentials_changed(service_id, usage_reset)
+            except Exception as e:
+                print(f"Credential change listener error: {e}")
+
+    def _services_changed(self):
+        if self.on_services_changed:
+            try:
+                self.on_services_changed()
+            except Exception as e:
+                print(f"Service change listener error: {e}")
 
     def initialize_db(self):
         """Initialize database with all required tables"""
@@ -54,20 +115,23 @@ class DatabaseManager:
     def get_services(self):
         """Get all configured services"""
         query = 'SELECT id, code, name, shortcut FROM services ORDER BY name'
-        cursor = self.execute_query(query)
-        return cursor.fetchall() if cursor else []
+        return self.execute_query(query)
     
+    def get_service_shortcuts(self) -> Dict[str, int]:
+        """Trigger shortcut -> service id for every service"""
+        return {row['shortcut']: row['id'] for row in self.execute_query('SELECT id, shortcut FROM services')}
+
     def get_service_by_code(self, code):
         """Get service details by code"""
         query = 'SELECT id, code, name, shortcut FROM services WHERE code = ?'
-        cursor = self.execute_query(query, (code,))
-        return cursor.fetchone() if cursor else None
+        rows = self.execute_query(query, (code,))
+        return rows[0] if rows else None
     
     def get_service_by_shortcut(self, shortcut):
         """Get service details by shortcut"""
         query = 'SELECT id, code, name, shortcut FROM services WHERE shortcut = ?'
-        cursor = self.execute_query(query, (shortcut,))
-        return cursor.fetchone() if cursor else None
+        rows = self.execute_query(query, (shortcut,))
+        return rows[0] if rows else None
     
     def get_credentials_by_service(self, service_id):
         """Get credentials for a specific service"""
@@ -78,9 +142,7 @@ class DatabaseManager:
             WHERE c.service_id = ?
             ORDER BY c.position
             '''
-            cursor = self.execute_query(query, (service_id,))
-            results = cursor.fetchall()
-            return results
+            return self.execute_query(query, (service_id,))
         except Exception as e:
             return []
     
@@ -88,79 +150,54 @@ class DatabaseManager:
         """Save a credential for a specific service"""
         if position is None:
             query = 'SELECT COALESCE(MAX(position), 0) + 1 FROM credentials WHERE service_id = ?'
-            cursor = self.execute_query(query, (service_id,))
-            position = cursor.fetchone()[0]
+            position = self.execute_query(query, (service_id,))[0][0]
         
         query = '''
         INSERT INTO credentials (service_id, content, position)
         VALUES (?, ?, ?)
         '''
         self.execute_query(query, (service_id, content, position))
+        self._credentials_changed(service_id)
 
-    def get_next_credential(self, shortcut):
-        """Get next credential based on service shortcut"""
-        try:
+    def get_credential_rotation(self, service_id: int) -> Tuple[List[sqlite3.Row], Optional[int]]:
+        """Get credentials in rotation order and the id of the one used last"""
+        with self._lock:
             cursor = self.conn.cursor()
-            
-            # Get service ID from shortcut
-            service_query = 'SELECT id FROM services WHERE shortcut = ?'
-            cursor.execute(service_query, (shortcut,))
-            service_result = cursor.fetchone()
-            
-            if not service_result:
-                return None
-            
-            service_id = service_result[0]
-            
-            # Get next credential for the specific service
             cursor.execute('''
-                SELECT MAX(position) 
-                FROM credentials 
-                WHERE service_id = ? AND last_used IS NOT NULL
+                SELECT id, content
+                FROM credentials
+                WHERE service_id = ?
+                ORDER BY position ASC
             ''', (service_id,))
-            last_pos = cursor.fetchone()[0] or 0
-            
+            rows = cursor.fetchall()
             cursor.execute('''
-                SELECT id, content, position 
-                FROM credentials 
-                WHERE service_id = ? AND position > ? 
-                ORDER BY position ASC 
+                SELECT id
+                FROM credentials
+                WHERE service_id = ? AND last_used IS NOT NULL
+                ORDER BY last_used DESC, position DESC
                 LIMIT 1
-            ''', (service_id, last_pos))
-            
-            result = cursor.fetchone()
-            if not result:
-                cursor.execute('''
-                    SELECT id, content, position 
-                    FROM credentials 
-                    WHERE service_id = ?
-                    ORDER BY position ASC 
-                    LIMIT 1
-                ''', (service_id,))
-                result = cursor.fetchone()
-            
-            if result:
-                id_, content, _ = result
-                cursor.execute('''
-                    UPDATE credentials 
-                    SET last_used = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                ''', (id_,))
-                self.conn.commit()
-                return content
-                
-            return None
-            
+            ''', (service_id,))
+            last = cursor.fetchone()
+            return rows, (last[0] if last else None)
+
+    def mark_credentials_used(self, usages: List[Tuple[str, int]]) -> None:
+        """Record (last_used, credential_id) pairs in a single transaction"""
+        query = 'UPDATE credentials SET last_used = ? WHERE id = ?'
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(query, usages)
         except sqlite3.Error as e:
-            raise DatabaseError(f"Database error: {str(e)}")
+            raise DatabaseError(f"Failed to record credential usage: {str(e)}")
 
-    def execute_query(self, query: str, parameters: tuple = ()) -> sqlite3.Cursor:
-        """Basic query execution with error handling"""
+    def execute_query(self, query: str, parameters: tuple = ()) -> List[sqlite3.Row]:
+        """Execute a query and return its rows, fetched before the shared connection is released"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, parameters)
-            self.conn.commit()
-            return cursor
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.execute(query, parameters)
+                rows = cursor.fetchall()
+                self.conn.commit()
+                return rows
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             raise DatabaseError(f"Database error: {str(e)}")
@@ -168,10 +205,11 @@ class DatabaseManager:
     def execute_query_one(self, query: str, parameters: tuple = ()) -> Optional[sqlite3.Row]:
         """Execute a query and return a single row"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, parameters)
-            self.conn.commit()
-            return cursor.fetchone()
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.execute(query, parameters)
+                self.conn.commit()
+                return cursor.fetchone()
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return None
@@ -179,7 +217,7 @@ class DatabaseManager:
     def execute_many(self, query: str, parameters: List[tuple]) -> None:
         """Execute many operations in a single transaction"""
         try:
-            with self.conn:
+            with self._lock, self.conn:
                 cursor = self.conn.cursor()
                 cursor.executemany(query, parameters)
         except sqlite3.Error as e:
@@ -188,12 +226,11 @@ class DatabaseManager:
 
     def get_all_shortcuts(self) -> List[Tuple[str, str]]:
         query = 'SELECT keyword, replacement FROM replacements ORDER BY keyword'
-        cursor = self.execute_query(query)
-        return cursor.fetchall() if cursor else []
+        return self.execute_query(query)
     def get_shortcut(self, keyword: str) -> Optional[Tuple[str, str]]:
         query = 'SELECT keyword, replacement FROM replacements WHERE keyword = ?'
-        cursor = self.execute_query(query, (keyword,))
-        return cursor.fetchone() if cursor else None
+        rows = self.execute_query(query, (keyword,))
+        return rows[0] if rows else None
     def save_shortcut(self, keyword: str, replacement: str):
         query = '''
         INSERT OR REPLACE INTO replacements (keyword, replacement, updated_at) 
@@ -215,11 +252,12 @@ class DatabaseManager:
             )
         '''
         self.execute_query(reorder_query)
+        self._credentials_changed()
     def get_credential_by_id(self, credential_id: int):
         """Get credential details by ID"""
         query = 'SELECT id, email, password, position FROM credentials WHERE id = ?'
-        cursor = self.execute_query(query, (credential_id,))
-        return cursor.fetchone() if cursor else None
+        rows = self.execute_query(query, (credential_id,))
+        return rows[0] if rows else None
     def delete_shortcut(self, keyword: str):
         query = 'DELETE FROM replacements WHERE keyword = ?'
         self.execute_query(query, (keyword,))
@@ -232,7 +270,7 @@ class DatabaseManager:
         VALUES (?, ?, CURRENT_TIMESTAMP)
         '''
         try:
-            with self.conn:
+            with self._lock, self.conn:
                 self.conn.executemany(query, shortcuts)
         except sqlite3.Error as e:
             raise DatabaseError(f"Bulk save failed: {str(e)}")
@@ -241,16 +279,18 @@ class DatabaseManager:
         self.execute_query(query)
     def backup_database(self, backup_path: str):
         try:
-            with sqlite3.connect(backup_path) as backup:
+            with self._lock, sqlite3.connect(backup_path) as backup:
                 self.conn.backup(backup)
         except sqlite3.Error as e:
             raise DatabaseError(f"Backup failed: {str(e)}")
     def restore_database(self, backup_path: str):
         try:
-            with sqlite3.connect(backup_path) as source:
+            with self._lock, sqlite3.connect(backup_path) as source:
                 source.backup(self.conn)
         except sqlite3.Error as e:
             raise DatabaseError(f"Restore failed: {str(e)}")
+        self._credentials_changed()
+        self._services_changed()
     
     def load_credentials_from_file(self, file_path: str, service_id: int) -> int:
         """Load credentials from file and append to existing ones"""
@@ -260,8 +300,7 @@ class DatabaseManager:
                 
             # Get max position for the specific service
             query = 'SELECT COALESCE(MAX(position), 0) FROM credentials WHERE service_id = ?'
-            cursor = self.execute_query(query, (service_id,))
-            last_position = cursor.fetchone()[0]
+            last_position = self.execute_query(query, (service_id,))[0][0]
             
             # Prepare credentials with service_id
             credentials = [
@@ -274,8 +313,9 @@ class DatabaseManager:
             VALUES (?, ?, ?)
             '''
             
-            with self.conn:
+            with self._lock, self.conn:
                 self.conn.executemany(query, credentials)
+            self._credentials_changed(service_id)
             return len(credentials)
             
         except Exception as e:
@@ -284,14 +324,12 @@ class DatabaseManager:
     def get_current_credential_count(self) -> int:
         """Get count of currently loaded credentials"""
         query = 'SELECT COUNT(*) FROM credentials'
-        cursor = self.execute_query(query)
-        return cursor.fetchone()[0]
+        return self.execute_query(query)[0][0]
     
     def check_duplicate_credentials(self, service_id: int, new_credentials: List[str]) -> List[str]:
         """Check for duplicates between new and existing credentials"""
         query = 'SELECT content FROM credentials WHERE service_id = ?'
-        cursor = self.execute_query(query, (service_id,))
-        existing = {row[0] for row in cursor.fetchall()}
+        existing = {row[0] for row in self.execute_query(query, (service_id,))}
         duplicates = [cred for cred in new_credentials if cred in existing]
         return duplicates
     
@@ -303,16 +341,17 @@ class DatabaseManager:
         else:
             query = 'UPDATE credentials SET last_used = NULL WHERE service_id = ?'
             self.execute_query(query, (service_id,))
+        self._credentials_changed(service_id, usage_reset=True)
     
     def get_credentials_count(self, service_id=None) -> int:
         if service_id:
             query = 'SELECT COUNT(*) FROM credentials WHERE service_id = ?'
-            cursor = self.execute_query(query, (service_id,))
+            rows = self.execute_query(query, (service_id,))
         else:
             query = 'SELECT COUNT(*) FROM credentials'
-            cursor = self.execute_query(query)
+            rows = self.execute_query(query)
         
-        return cursor.fetchone()[0] if cursor else 0
+        return rows[0][0] if rows else 0
 
     
     def clear_all_credentials(self, service_id: int = None) -> bool:
@@ -322,6 +361,7 @@ class DatabaseManager:
         else:
             query = 'DELETE FROM credentials WHERE service_id = ?'
             self.execute_query(query, (service_id,))
+        self._credentials_changed(service_id)
         return self.get_credentials_count(service_id) == 0
     
     def save_hotkey(self, key_combo: str, action_value: str, action_type: str):
@@ -342,8 +382,7 @@ class DatabaseManager:
         FROM hotkeys 
         ORDER BY created_at
         '''
-        cursor = self.execute_query(query)
-        return cursor.fetchall() if cursor else []
+        return self.execute_query(query)
     
     def delete_hotkey(self, key_combo: str):
         """Delete a specific hotkey"""
@@ -357,8 +396,8 @@ class DatabaseManager:
         FROM hotkeys 
         WHERE key_combo = ?
         '''
-        cursor = self.execute_query(query, (key_combo,))
-        return cursor.fetchone() if cursor else None
+        rows = self.execute_query(query, (key_combo,))
+        return rows[0] if rows else None
 
     def get_service_id_by_name(self, service_name: str) -> Optional[int]:
         """Get service ID efficiently"""
@@ -379,7 +418,7 @@ class DatabaseManager:
             # Get existing credentials in a single query
             query = "SELECT content FROM credentials WHERE service_id = ?"
             existing_contents = {
-                row['content'] for row in self.execute_query(query, (service_id,)).fetchall()
+                row['content'] for row in self.execute_query(query, (service_id,))
             }
             
             # Get current max position
@@ -408,6 +447,7 @@ class DatabaseManager:
             if to_insert:
                 self._insert_credential_batch(to_insert)
             
+            self._credentials_changed(service_id)
             return len(credentials) - duplicates, duplicates
             
         except Exception as e:
@@ -433,13 +473,14 @@ class DatabaseManager:
                 WHERE id = ? AND service_id = ?
             """
             
-            with self.conn:
+            with self._lock, self.conn:
                 cursor = self.conn.cursor()
                 cursor.executemany(update_query, [
                     (update['content'], update['position'], update.get('last_used'),
                      update['id'], service_id)
                     for update in credential_updates
                 ])
+            self._credentials_changed(service_id)
         except sqlite3.Error as e:
             print(f"Error in bulk update: {e}")
             raise
@@ -462,12 +503,14 @@ class DatabaseManager:
                 VALUES (?, ?, ?)
             """
             
-            with self.conn:  # Start transaction
+            with self._lock, self.conn:  # Start transaction
                 cursor = self.conn.cursor()
                 cursor.executemany(query, [
                     (cred['service_id'], cred['content'], cred['position'])
                     for cred in credentials
                 ])
+            service_ids = {cred['service_id'] for cred in credentials}
+            self._credentials_changed(service_ids.pop() if len(service_ids) == 1 else None)
                 
         except Exception as e:
             print(f"Error in batch save: {e}")
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+from services.backends.base import BackendError, ClipboardError
+from services.database import DatabaseError
+
+# Components the engine can recover on their own
+HOOK = 'hook'
+WORKER = 'worker'
+CLIPBOARD = 'clipboard'
+INJECTOR = 'injector'
+DATABASE = 'database'
+# Errors no other component claims; recovery drops the pending expansions
+EXPANSION = 'expansion'
+
+
+def classify_error(error: BaseException) -> str:
+    """Component responsible for an error, following wrapped causes"""
+    while error is not None:
+        if isinstance(error, ClipboardError):
+            return CLIPBOARD
+        if isinstance(error, (DatabaseError, sqlite3.Error)):
+            return DATABASE
+        if isinstance(error, (BackendError, OSError)):
+            return INJECTOR
+        error = error.__cause__
+    return EXPANSION
+
+
+class ComponentError(NamedTuple):
+    component: str
+    message: str
+    at: float
+
+
+class ServiceHealth:
+    """Liveness of the engine's parts from heartbeats and classified errors.
+
+    Idle time is never a failure. When the system saw input the hook did not,
+    which mouse input alone also causes, a probe key is injected; the hook is
+    stale only if the probe never comes back. A worker is stalled only while
+    it is stuck on one item. Failing components are reported individually so
+    recovery can touch just those.
+    """
+
+    def __init__(self, hook_grace: float = 5.0, probe_timeout: float = 1.0,
+                 stall_timeout: float = 30.0, error_threshold: int = 3):
+        self.hook_grace = hook_grace
+        self.probe_timeout = probe_timeout
+        self.stall_timeout = stall_timeout
+        self.error_threshold = error_threshold
+        self._lock = threading.Lock()
+        # Monotonic time the key handler last ran; written by the dispatch thread only
+        self.hook_beat = time.monotonic()
+        # When the outstanding probe key was injected, None once the hook saw it
+        self.probe_sent: Optional[float] = None
+        # Per worker stage: when it picked up its current item, or None while it waits
+        self.busy_since: Dict[str, Optional[float]] = {}
+        self.consecutive_errors: Dict[str, int] = {}
+        self.last_error: Optional[ComponentError] = None
+        self.recoveries: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hook_beat = time.monotonic()
+            self.probe_sent = None
+            self.busy_since.clear()
+            self.consecutive_errors.clear()
+
+    def busy(self, stage: str) -> None:
+        self.busy_since[stage] = time.monotonic()
+
+    def idle(self, stage: str) -> None:
+        self.busy_since[stage] = None
+
+    def should_probe(self, input_idle: Optional[float]) -> bool:
+        """Whether the system saw input the hook did not since its grace period.
+
+        Injected keys reset the system idle timer, so this never holds on an
+        idle desktop or where the platform cannot report idle time.
+        """
+        if input_idle is None or self.probe_sent is not None:
+            return False
+        now = time.monotonic()
+        return (now - input_idle) - self.hook_beat > self.hook_grace
+
+    def probe_started(self) -> None:
+        self.probe_sent = time.monotonic()
+
+    def probe_answered(self) -> None:
+        self.probe_sent = None
+
+    def probe_lost(self) -> bool:
+        probe_sent = self.probe_sent
+        return probe_sent is not None and time.monotonic() - probe_sent > self.probe_timeout
+
+    def record_error(self, error: BaseException) -> str:
+        """Count an error against its component and return that component"""
+        component = classify_error(error)
+        with self._lock:
+            self.consecutive_errors[component] = self.consecutive_errors.get(component, 0) + 1
+            self.last_error = ComponentError(component, str(error), time.time())
+        return component
+
+    def record_success(self) -> None:
+        """A completed expansion proves every component it went through"""
+        if self.consecutive_errors:
+            with self._lock:
+                self.consecutive_errors.clear()
+
+    def failing(self, component: str) -> bool:
+        return self.consecutive_errors.get(component, 0) >= self.error_threshold
+
+    def recovered(self, component: str) -> None:
+        with self._lock:
+            self.consecutive_errors.pop(component, None)
+            self.recoveries[component] = self.recoveries.get(component, 0) + 1
+            if component == HOOK:
+                self.hook_beat = time.monotonic()
+                self.probe_sent = None
+
+    def check(self, workers_alive: bool) -> List[str]:
+        """Components needing recovery; reads only in-memory state"""
+        now = time.monotonic()
+        failed = []
+        if self.probe_lost():
+            failed.append(HOOK)
+        stalled = any(since is not None and now - since > self.stall_timeout
+                      for since in list(self.busy_since.values()))
+        if not workers_alive or stalled:
+            failed.append(WORKER)
+        with self._lock:
+            failed.extend(component for component in self.consecutive_errors
+                          if component not in failed and self.failing(component))
+        return failed
+
+    def get_stats(self) -> Dict[str, object]:
+        now = time.monotonic()
+        with self._lock:
+            last_error = self.last_error._asdict() if self.last_error else None
+            return {
+                'hook_idle': now - self.hook_beat,
+                'busy': {stage: now - since for stage, since in self.busy_since.items() if since is not None},
+                'consecutive_errors': dict(self.consecutive_errors),
+                'last_error': last_error,
+                'recoveries': dict(self.recoveries),
+            }
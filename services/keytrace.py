@@ -0,0 +1,158 @@
+import argparse
+import struct
+import sys
+import threading
+import time
+from typing import BinaryIO, Iterable, List, NamedTuple, Optional
+
+TRACE_MAGIC = b'KPTR'
+TRACE_VERSION = 1
+EVENT_TYPES = ('down', 'up')
+
+# Header: magic, version. Record: ns since trace start, event type, scan code, name length
+_HEADER = struct.Struct('<4sH')
+_RECORD = struct.Struct('<QBHB')
+
+
+class TraceEvent(NamedTuple):
+    timestamp_ns: int
+    event_type: str
+    name: str
+    scan_code: int = 0
+
+
+def _write_event(handle: BinaryIO, event: TraceEvent) -> None:
+    name = event.name.encode('utf-8')[:255]
+    handle.write(_RECORD.pack(
+        event.timestamp_ns,
+        EVENT_TYPES.index(event.event_type),
+        event.scan_code & 0xFFFF,
+        len(name),
+    ))
+    handle.write(name)
+
+
+def write_trace(path: str, events: Iterable[TraceEvent]) -> int:
+    """Write events to a trace file and return how many were written"""
+    count = 0
+    with open(path, 'wb') as handle:
+        handle.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION))
+        for event in events:
+            _write_event(handle, event)
+            count += 1
+    return count
+
+
+def read_trace(path: str) -> List[TraceEvent]:
+    with open(path, 'rb') as handle:
+        data = handle.read()
+    if len(data) < _HEADER.size:
+        raise TraceError("Trace file is truncated")
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != TRACE_MAGIC:
+        raise TraceError("Not a key trace file")
+    if version != TRACE_VERSION:
+        raise TraceError(f"Unsupported trace version: {version}")
+    events = []
+    offset = _HEADER.size
+    while offset < len(data):
+        if offset + _RECORD.size > len(data):
+            raise TraceError("Trace file is truncated")
+        timestamp_ns, event_type, scan_code, name_length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        name = data[offset:offset + name_length].decode('utf-8')
+        offset += name_length
+        events.append(TraceEvent(timestamp_ns, EVENT_TYPES[event_type], name, scan_code))
+    return events
+
+
+def trace_from_text(text: str, interval: float = 0.08) -> List[TraceEvent]:
+    """Synthesize a down/up trace for typing text at a fixed pace"""
+    events = []
+    step_ns = int(interval * 1e9)
+    for index, char in enumerate(text):
+        name = {' ': 'space', '\n': 'enter', '\b': 'backspace'}.get(char, char)
+        events.append(TraceEvent(index * step_ns, 'down', name))
+        events.append(TraceEvent(index * step_ns + step_ns // 2, 'up', name))
+    return events
+
+
+class TraceRecorder:
+    """Appends events from a key source to a trace file as they arrive"""
+
+    def __init__(self, path: str, source):
+        self.path = path
+        self.source = source
+        self.count = 0
+        self._handle: Optional[BinaryIO] = None
+        self._started_ns = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self._handle = open(self.path, 'wb')
+        self._handle.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION))
+        self._started_ns = time.perf_counter_ns()
+        self.source.hook(self.on_event)
+
+    def on_event(self, event) -> None:
+        with self._lock:
+            if self._handle is None or event.event_type not in EVENT_TYPES:
+                return
+            _write_event(self._handle, TraceEvent(
+                time.perf_counter_ns() - self._started_ns,
+                event.event_type,
+                event.name or '',
+                getattr(event, 'scan_code', 0) or 0,
+            ))
+            self.count += 1
+
+    def stop(self) -> None:
+        self.source.unhook()
+        with self._lock:
+            if self._handle:
+                self._handle.close()
+                self._handle = None
+
+
+class TraceError(Exception):
+    pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record or inspect keystroke traces")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="Record from the live keyboard hook")
+    record.add_argument('path')
+    record.add_argument('--seconds', type=float, default=60.0)
+    generate = commands.add_parser('generate', help="Build a trace from text")
+    generate.add_argument('path')
+    generate.add_argument('text')
+    generate.add_argument('--interval', type=float, default=0.08)
+    info = commands.add_parser('info', help="Summarize a trace")
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        from services.backends.win32 import Win32KeyEventSource
+        recorder = TraceRecorder(args.path, Win32KeyEventSource())
+        recorder.start()
+        print(f"Recording for {args.seconds:.0f}s...")
+        try:
+            time.sleep(args.seconds)
+        except KeyboardInterrupt:
+            pass
+        recorder.stop()
+        print(f"Recorded {recorder.count} events to {args.path}")
+    elif args.command == 'generate':
+        count = write_trace(args.path, trace_from_text(args.text.encode().decode('unicode_escape'), args.interval))
+        print(f"Wrote {count} events to {args.path}")
+    else:
+        events = read_trace(args.path)
+        duration = events[-1].timestamp_ns / 1e9 if events else 0.0
+        downs = sum(1 for event in events if event.event_type == 'down')
+        print(f"{len(events)} events ({downs} key downs) over {duration:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+ROOT_STATE = 0
+DEAD_STATE = -1
+
+# Edge keys pack (state, code point) into one int; code points fit in 21 bits
+_CHAR_BITS = 21
+
+
+class KeywordTrie:
+    """Compiled trie over shortcut keywords, addressed by integer states"""
+
+    # Whether a state alone decides matches, without the characters that led to it
+    matches_anywhere = False
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        self._edges: Dict[int, int] = {}
+        self._accept: Dict[int, str] = {}
+        self.state_count = 1
+        for keyword in keywords:
+            self.add(keyword)
+
+    def add(self, keyword: str) -> int:
+        """Insert a keyword and return its accepting state"""
+        state = ROOT_STATE
+        for char in keyword:
+            key = (state << _CHAR_BITS) | ord(char)
+            next_state = self._edges.get(key)
+            if next_state is None:
+                next_state = self.state_count
+                self.state_count += 1
+                self._edges[key] = next_state
+            state = next_state
+        self._accept[state] = keyword
+        return state
+
+    def discard(self, keyword: str) -> None:
+        """Stop accepting a keyword; its states stay so live cursors remain valid"""
+        state = ROOT_STATE
+        for char in keyword:
+            state = self.step(state, char)
+            if state < 0:
+                return
+        if self._accept.get(state) == keyword:
+            del self._accept[state]
+
+    def step(self, state: int, char: str) -> int:
+        """Advance one character; unknown edges fall into the dead state"""
+        if state < 0:
+            return DEAD_STATE
+        return self._edges.get((state << _CHAR_BITS) | ord(char), DEAD_STATE)
+
+    def keyword_at(self, state: int) -> Optional[str]:
+        """Keyword accepted by a state, if any"""
+        return self._accept.get(state)
+
+    def keywords(self) -> Iterable[str]:
+        return self._accept.values()
+
+    def __len__(self) -> int:
+        return len(self._accept)
+
+    def __contains__(self, keyword: str) -> bool:
+        state = ROOT_STATE
+        for char in keyword:
+            state = self.step(state, char)
+            if state < 0:
+                return False
+        return self._accept.get(state) == keyword
+
+
+class TrieCursor:
+    """Typing position inside a KeywordTrie, one pushed state per character"""
+
+    __slots__ = ('trie', 'max_depth', '_stack', '_overflow')
+
+    def __init__(self, trie: KeywordTrie, max_depth: int):
+        self.trie = trie
+        self.max_depth = max_depth
+        self._stack: List[int] = [ROOT_STATE]
+        self._overflow = 0
+
+    @property
+    def state(self) -> int:
+        return self._stack[-1]
+
+    def push(self, char: str) -> None:
+        if len(self._stack) > self.max_depth:
+            if not self.trie.matches_anywhere:
+                # Nothing this deep can match; only track depth for backspace
+                self._overflow += 1
+                return
+            # The automaton keeps matching; only the oldest backspace history is dropped
+            del self._stack[1]
+        self._stack.append(self.trie.step(self._stack[-1], char))
+
+    def pop(self) -> None:
+        if self._overflow:
+            self._overflow -= 1
+        elif len(self._stack) > 1:
+            self._stack.pop()
+
+    def reset(self, trie: Optional[KeywordTrie] = None) -> None:
+        if trie is not None:
+            self.trie = trie
+        del self._stack[1:]
+        self._overflow = 0
+
+    def match(self) -> Optional[str]:
+        """Keyword typed since the last reset, if it is a complete shortcut"""
+        if self._overflow:
+            return None
+        return self.trie.keyword_at(self._stack[-1])
+
+    def __len__(self) -> int:
+        return len(self._stack) - 1 + self._overflow
+
+
+class KeywordAutomaton(KeywordTrie):
+    """Aho-Corasick automaton that reports keywords ending at any position"""
+
+    matches_anywhere = True
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        super().__init__(keywords)
+        self._fail: Dict[int, int] = {}
+        self._output: Dict[int, str] = {}
+        self._alphabet = set()
+        # States by the character leading into them, for relink()
+        self._entered_by: Dict[int, List[int]] = {}
+        # States below this id were linked by the last compile() or relink()
+        self._linked = 1
+        self.compile()
+
+    def compile(self) -> None:
+        """Compute failure and output links breadth-first over the trie.
+
+        Links are built aside and swapped in, so it is safe to recompile after
+        add/discard while another thread keeps stepping through the automaton.
+        """
+        mask = (1 << _CHAR_BITS) - 1
+        edges = list(self._edges.items())
+        children: Dict[int, List[tuple]] = {}
+        for key, child in edges:
+            children.setdefault(key >> _CHAR_BITS, []).append((key & mask, child))
+        entered_by: Dict[int, List[int]] = {}
+        for key, child in edges:
+            entered_by.setdefault(key & mask, []).append(child)
+        fail_links = {ROOT_STATE: ROOT_STATE}
+        outputs: Dict[int, str] = {}
+        level = [ROOT_STATE]
+        while level:
+            next_level = []
+            for state in level:
+                for code, child in children.get(state, ()):
+                    fail = fail_links[state]
+                    if state != ROOT_STATE:
+                        while True:
+                            target = self._edges.get((fail << _CHAR_BITS) | code)
+                            if target is not None:
+                                fail = target
+                                break
+                            if fail == ROOT_STATE:
+                                break
+                            fail = fail_links[fail]
+                    fail_links[child] = fail
+                    output = self._accept.get(child) or outputs.get(fail)
+                    if output is not None:
+                        outputs[child] = output
+                    next_level.append(child)
+            level = next_level
+        self._fail = fail_links
+        self._output = outputs
+        self._alphabet = set(entered_by)
+        self._entered_by = entered_by
+        self._linked = self.state_count
+
+    def relink(self, keywords: Iterable[str]) -> None:
+        """Patch links and outputs after add/discard of the given keywords.
+
+        Only states whose string ends with a prefix of a changed keyword can
+        need a new failure link, and only those ending with the whole keyword
+        can change output, so the cost follows the edit rather than the size
+        of the automaton. Links only ever move to a longer valid suffix, so a
+        concurrent reader sees either the old or the new target.
+        """
+        keywords = list(keywords)
+        paths = [(keyword, self._path(keyword)) for keyword in keywords]
+        new_states: Set[int] = set()
+        # Link the new states first: relinking below needs every state reachable
+        for keyword, path in paths:
+            for depth, state in enumerate(path, 1):
+                if state >= self._linked and state not in new_states:
+                    new_states.add(state)
+                    code = ord(keyword[depth - 1])
+                    self._entered_by.setdefault(code, []).append(state)
+                    self._alphabet.add(code)
+                    self._fail[state] = self._longest_suffix_state(keyword, depth)
+        changed_outputs = set(new_states)
+        for keyword, path in paths:
+            if len(path) < len(keyword):
+                # Never added, so nothing can end with it
+                continue
+            # States whose string ends with keyword[:depth]
+            ending = list(self._entered_by.get(ord(keyword[0]), ()))
+            for depth, state in enumerate(path, 1):
+                if depth > 1:
+                    code = ord(keyword[depth - 1])
+                    ending = [
+                        target for target in (
+                            self._edges.get((source << _CHAR_BITS) | code) for source in ending
+                        ) if target is not None
+                    ]
+                if state in new_states:
+                    # A new state is now the longest suffix of any longer string
+                    # ending with it, unless a still longer one already was
+                    longer = set(ending)
+                    for other in ending:
+                        if other != state and self._fail.get(other, ROOT_STATE) not in longer:
+                            self._fail[other] = state
+            changed_outputs.update(ending)
+        for state in changed_outputs:
+            output = self._first_accept(state)
+            if output is None:
+                self._output.pop(state, None)
+            else:
+                self._output[state] = output
+        self._linked = self.state_count
+
+    def keywords_containing(self, keywords: Iterable[str]) -> Set[str]:
+        """Accepted keywords that contain any of the given ones, themselves included"""
+        found = set()
+        for keyword in keywords:
+            if keyword in self:
+                found.add(keyword)
+            path = self._path(keyword)
+            if len(path) < len(keyword):
+                continue
+            ending = list(self._entered_by.get(ord(keyword[0]), ()))
+            for char in keyword[1:]:
+                code = ord(char)
+                ending = [
+                    target for target in (
+                        self._edges.get((source << _CHAR_BITS) | code) for source in ending
+                    ) if target is not None
+                ]
+            # Every keyword passing through a state that ends with this one
+            pending = ending
+            while pending:
+                state = pending.pop()
+                accepted = self._accept.get(state)
+                if accepted is not None:
+                    found.add(accepted)
+                for code in self._alphabet:
+                    child = self._edges.get((state << _CHAR_BITS) | code)
+                    if child is not None:
+                        pending.append(child)
+        return found
+
+    def _path(self, keyword: str) -> List[int]:
+        """Trie states spelling out a keyword, stopping where an edge is missing"""
+        path = []
+        state = ROOT_STATE
+        for char in keyword:
+            state = self._edges.get((state << _CHAR_BITS) | ord(char))
+            if state is None:
+                break
+            path.append(state)
+        return path
+
+    def _longest_suffix_state(self, keyword: str, depth: int) -> int:
+        """State for the longest proper suffix of keyword[:depth] in the trie"""
+        for start in range(1, depth):
+            state = ROOT_STATE
+            for char in keyword[start:depth]:
+                state = self._edges.get((state << _CHAR_BITS) | ord(char))
+                if state is None:
+                    break
+            else:
+                return state
+        return ROOT_STATE
+
+    def _first_accept(self, state: int) -> Optional[str]:
+        """Longest keyword accepted along the failure chain of a state"""
+        while state != ROOT_STATE:
+            keyword = self._accept.get(state)
+            if keyword is not None:
+                return keyword
+            state = self._fail.get(state, ROOT_STATE)
+        return None
+
+    def step(self, state: int, char: str) -> int:
+        """Follow goto edges, falling back along failure links (bounded by keyword length)"""
+        code = ord(char)
+        if code not in self._alphabet:
+            return ROOT_STATE
+        while True:
+            target = self._edges.get((state << _CHAR_BITS) | code)
+            if target is not None:
+                return target
+            if state == ROOT_STATE:
+                return ROOT_STATE
+            # States added since the last compile have no link yet
+            state = self._fail.get(state, ROOT_STATE)
+
+    def keyword_at(self, state: int) -> Optional[str]:
+        """Longest keyword ending at this state, if any"""
+        return self._output.get(state)
+
+    def suffix_keywords(self, state: int) -> List[str]:
+        """Shorter keywords that also end at this state"""
+        found = []
+        state = self._fail.get(state, ROOT_STATE)
+        while state != ROOT_STATE:
+            keyword = self._accept.get(state)
+            if keyword is not None:
+                found.append(keyword)
+            state = self._fail[state]
+        return found
+
+
+class ShadowedKeyword(NamedTuple):
+    keyword: str
+    shadowed_by: str
+    reason: str
+
+
+def find_shadowed_keywords(automaton: KeywordAutomaton) -> List[ShadowedKeyword]:
+    """Report keywords that can never expand as typed in instant mode.
+
+    A keyword is 'overridden' when it is a suffix of a longer keyword, which
+    wins whenever the longer one is typed, and 'unreachable' when a shorter
+    keyword completes inside it and fires first.
+    """
+    shadowed = []
+    for keyword in automaton.keywords():
+        shadowed.extend(_shadowed_through(automaton, keyword))
+    return shadowed
+
+
+def update_shadowed_keywords(automaton: KeywordAutomaton, shadowed: Iterable[ShadowedKeyword],
+                             changed: Iterable[str]) -> List[ShadowedKeyword]:
+    """find_shadowed_keywords after relink(), redoing only keywords the change can affect"""
+    affected = automaton.keywords_containing(changed)
+    # Entries belong to the keyword whose typing found them; removed ones go too
+    stale = affected.union(changed)
+    kept = [
+        entry for entry in shadowed
+        if (entry.shadowed_by if entry.reason == 'overridden' else entry.keyword) not in stale
+    ]
+    for keyword in affected:
+        kept.extend(_shadowed_through(automaton, keyword))
+    return kept
+
+
+def _shadowed_through(automaton: KeywordAutomaton, keyword: str) -> List[ShadowedKeyword]:
+    """Entries found by typing one keyword: it is unreachable, or it overrides suffixes"""
+    state = ROOT_STATE
+    for index, char in enumerate(keyword):
+        state = automaton.step(state, char)
+        output = automaton.keyword_at(state)
+        if output is not None and index < len(keyword) - 1:
+            return [ShadowedKeyword(keyword, output, 'unreachable')]
+    return [ShadowedKeyword(shorter, keyword, 'overridden') for shorter in automaton.suffix_keywords(state)]
@@ -0,0 +1,114 @@
+import sys
+import threading
+from collections import deque
+from types import MappingProxyType, ModuleType
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Set
+from utils.logger import Logger
+
+
+def deep_sizeof(obj: Any, exclude: Iterable[Any] = ()) -> int:
+    """Bytes held by obj and everything it references, each object counted once.
+
+    Follows containers, mapping proxies, instance dicts and slots; classes,
+    functions and modules are shared with the rest of the process and skipped.
+    """
+    seen: Set[int] = {id(item) for item in exclude}
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or callable(item) or isinstance(item, ModuleType):
+            continue
+        seen.add(id(item))
+        if isinstance(item, MappingProxyType):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, int, float, bool)) or item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            if hasattr(item, '__dict__'):
+                stack.append(vars(item))
+            for cls in type(item).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    if hasattr(item, name):
+                        stack.append(getattr(item, name))
+    return total
+
+
+class MemorySource(NamedTuple):
+    measure: Callable[[], int]
+    # Frees memory down to the given byte count and returns bytes freed; None if fixed
+    trim: Optional[Callable[[int], int]]
+
+
+class MemoryBudget:
+    """Byte accounting for the engine's in-memory structures against one budget.
+
+    Each structure reports its own size. When the total is over budget the
+    evictable ones are trimmed in registration order until it fits, so a
+    structure shrinks by exactly the overshoot instead of being wiped.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.logger = Logger(__name__)
+        self._sources: Dict[str, MemorySource] = {}
+        self._lock = threading.Lock()
+        self.trimmed_bytes = 0
+        self.over_budget = 0
+
+    def register(self, name: str, measure: Callable[[], int],
+                 trim: Optional[Callable[[int], int]] = None) -> None:
+        self._sources[name] = MemorySource(measure, trim)
+
+    def breakdown(self) -> Dict[str, int]:
+        sizes = {}
+        for name, source in self._sources.items():
+            try:
+                sizes[name] = source.measure()
+            except Exception as e:
+                self.logger.error(f"Failed to measure {name}: {e}")
+                sizes[name] = 0
+        return sizes
+
+    def enforce(self) -> int:
+        """Trim evictable structures until the total fits; returns the resulting total"""
+        with self._lock:
+            sizes = self.breakdown()
+            total = sum(sizes.values())
+            excess = total - self.budget_bytes
+            if excess <= 0:
+                return total
+            self.over_budget += 1
+            for name, source in self._sources.items():
+                if excess <= 0:
+                    break
+                if source.trim is None or not sizes[name]:
+                    continue
+                freed = source.trim(max(0, sizes[name] - excess))
+                self.trimmed_bytes += freed
+                excess -= freed
+                total -= freed
+                self.logger.info(f"Trimmed {freed} bytes from {name}")
+            if excess > 0:
+                self.logger.warning(
+                    f"Fixed structures alone exceed the memory budget by {excess} bytes"
+                )
+            return total
+
+    def get_stats(self) -> Dict[str, Any]:
+        sizes = self.breakdown()
+        return {
+            'budget_bytes': self.budget_bytes,
+            'total_bytes': sum(sizes.values()),
+            'breakdown': sizes,
+            'trimmed_bytes': self.trimmed_bytes,
+            'over_budget': self.over_budget,
+        }
@@ -0,0 +1,239 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from utils.logger import Logger
+
+
+class TaskRuntime:
+    """Accumulated runtime of every job scheduled under one name"""
+
+    __slots__ = ('runs', 'errors', 'skipped', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        # Periodic background runs skipped because the previous one was still going
+        self.skipped = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'total_ms': self.total_ns / 1e6,
+            'mean_ms': self.total_ns / self.runs / 1e6 if self.runs else 0.0,
+            'max_ms': self.max_ns / 1e6,
+        }
+
+
+class ScheduledTask:
+    """Handle for one delayed or periodic job"""
+
+    __slots__ = ('name', 'func', 'interval', 'jitter', 'due', 'cancelled', 'scheduler',
+                 'background', 'running')
+
+    def __init__(self, scheduler: 'TaskScheduler', name: str, func: Callable[[], Any],
+                 due: float, interval: Optional[float], jitter: float, background: bool = False):
+        self.scheduler = scheduler
+        self.name = name
+        self.func = func
+        self.due = due
+        self.interval = interval
+        self.jitter = jitter
+        self.cancelled = False
+        self.background = background
+        self.running = False
+
+    @property
+    def periodic(self) -> bool:
+        return self.interval is not None
+
+    def cancel(self) -> None:
+        self.scheduler.cancel(self)
+
+
+class TaskScheduler:
+    """One thread running every delayed and periodic job of the application.
+
+    Jobs sit in a heap ordered by due time and the thread sleeps until the
+    earliest one, so adding features adds heap entries, not threads or
+    wakeups. Jobs run on the scheduler thread and must be short. Jobs that
+    block on the database, the clipboard or a restart are scheduled with
+    background=True: the scheduler thread only hands them to a small worker
+    pool, so they never delay the jobs due behind them.
+    """
+
+    def __init__(self, name: str = 'scheduler', workers: int = 2):
+        self.name = name
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.logger = Logger(__name__)
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, ScheduledTask]] = []
+        self._sequence = itertools.count()
+        self._runtime: Dict[str, TaskRuntime] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.wakeups = 0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        with self._cond:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def call_later(self, delay: float, func: Callable[[], Any], name: Optional[str] = None,
+                   background: bool = False) -> ScheduledTask:
+        """Run func once after delay seconds"""
+        return self._add(func, delay, None, 0.0, name, background)
+
+    def call_every(self, interval: float, func: Callable[[], Any], name: Optional[str] = None,
+                   jitter: float = 0.0, initial_delay: Optional[float] = None,
+                   background: bool = False) -> ScheduledTask:
+        """Run func every interval seconds, each run shifted by up to ±jitter * interval"""
+        delay = interval if initial_delay is None else initial_delay
+        return self._add(func, delay, interval, jitter, name, background)
+
+    def _add(self, func: Callable[[], Any], delay: float, interval: Optional[float],
+             jitter: float, name: Optional[str], background: bool = False) -> ScheduledTask:
+        name = name or getattr(func, '__qualname__', repr(func))
+        task = ScheduledTask(self, name, func, time.monotonic() + self._jittered(delay, jitter),
+                             interval, jitter, background)
+        with self._cond:
+            self._runtime.setdefault(name, TaskRuntime())
+            self._push(task)
+        return task
+
+    @staticmethod
+    def _jittered(delay: float, jitter: float) -> float:
+        if not jitter:
+            return delay
+        return max(0.0, delay * (1 + random.uniform(-jitter, jitter)))
+
+    def _push(self, task: ScheduledTask) -> None:
+        heapq.heappush(self._heap, (task.due, next(self._sequence), task))
+        # Only a new earliest job changes how long the thread should sleep
+        if self._heap[0][2] is task:
+            self._cond.notify()
+
+    def cancel(self, task: ScheduledTask) -> None:
+        # Cancelled entries are dropped when they reach the top of the heap
+        with self._cond:
+            task.cancelled = True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    remaining = self._heap[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    return
+                self.wakeups += 1
+                _, _, task = heapq.heappop(self._heap)
+            if task.background:
+                self._dispatch(task)
+            else:
+                self._execute(task)
+            self._reschedule(task)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._cond:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=f'{self.name}-worker'
+                )
+            return self._executor
+
+    def _dispatch(self, task: ScheduledTask) -> None:
+        if task.running:
+            self._runtime[task.name].skipped += 1
+            return
+        task.running = True
+        try:
+            self._pool().submit(self._execute, task)
+        except RuntimeError as e:
+            # Shut down while stopping
+            task.running = False
+            self.logger.debug(f"Scheduled task '{task.name}' not run: {e}")
+
+    def _execute(self, task: ScheduledTask) -> None:
+        runtime = self._runtime[task.name]
+        started = time.perf_counter_ns()
+        try:
+            task.func()
+        except Exception as e:
+            runtime.errors += 1
+            self.logger.error(f"Scheduled task '{task.name}' failed: {e}")
+        finally:
+            task.running = False
+        elapsed = time.perf_counter_ns() - started
+        runtime.runs += 1
+        runtime.total_ns += elapsed
+        runtime.max_ns = max(runtime.max_ns, elapsed)
+
+    def _reschedule(self, task: ScheduledTask) -> None:
+        if task.periodic:
+            with self._cond:
+                if not task.cancelled:
+                    # Fixed rate from the previous due time, without a burst of catch-up runs
+                    task.due = max(task.due + self._jittered(task.interval, task.jitter), time.monotonic())
+                    self._push(task)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Runtime per job name, plus seconds until its next run while one is pending"""
+        with self._cond:
+            now = time.monotonic()
+            stats = {name: runtime.stats() for name, runtime in self._runtime.items()}
+            for due, _, task in self._heap:
+                if not task.cancelled:
+                    due_in = max(0.0, due - now)
+                    stats[task.name]['due_in'] = min(due_in, stats[task.name].get('due_in', due_in))
+            stats['_scheduler'] = {'pending': len(self._heap), 'wakeups': self.wakeups}
+            return stats
+
+
+_shared: Optional[TaskScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler() -> TaskScheduler:
+    """The application-wide scheduler, started on first use"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TaskScheduler()
+        if not _shared.running:
+            _shared.start()
+        return _shared
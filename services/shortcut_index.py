@@ -0,0 +1,205 @@
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+from services.matcher import (
+    KeywordAutomaton, KeywordTrie, ShadowedKeyword, find_shadowed_keywords, update_shadowed_keywords
+)
+
+# Record kinds
+PLAIN = 'plain'
+CREDENTIAL = 'credential'
+# Output strategies
+TYPE = 'type'
+PASTE = 'paste'
+
+# Returns why a shortcut cannot be expanded, or None if it can. The replacement
+# is None for service triggers, whose text is a credential chosen per expansion.
+ShortcutValidator = Callable[[str, Optional[str]], Optional[str]]
+
+
+def common_prefix_length(keyword: str, replacement: str) -> int:
+    """How many leading characters of the typed keyword the replacement keeps"""
+    length = 0
+    for typed, wanted in zip(keyword, replacement):
+        if typed != wanted:
+            break
+        length += 1
+    return length
+
+
+class ShortcutRecord:
+    """One shortcut compiled for the injection path.
+
+    Everything the expansion needs is decided here, once per load: whether
+    the entry is valid, how many characters to erase, and what to send and
+    how. Service triggers carry their service_id instead of a payload; the
+    credential is taken from the rotation per expansion.
+    """
+
+    __slots__ = ('keyword', 'replacement', 'kind', 'valid', 'backspaces', 'strategy', 'payload',
+                 'service_id')
+
+    def __init__(self, keyword: str, replacement: Optional[str], kind: str, valid: bool,
+                 backspaces: int, strategy: Optional[str], payload: Optional[str],
+                 service_id: Optional[int] = None):
+        self.keyword = keyword
+        self.replacement = replacement
+        self.kind = kind
+        self.valid = valid
+        self.backspaces = backspaces
+        self.strategy = strategy
+        self.payload = payload
+        self.service_id = service_id
+
+    @classmethod
+    def compile(cls, keyword: str, replacement: Optional[str], instant: bool, direct_typing_max: int,
+                problem: Optional[str] = None, service_id: Optional[int] = None) -> 'ShortcutRecord':
+        # Delimiter mode also erases the space/enter that triggered it
+        delimiter = 0 if instant else 1
+        if service_id is not None:
+            return cls(keyword, None, CREDENTIAL, problem is None,
+                       len(keyword) + delimiter, None, None, service_id)
+        # Leading typed characters the replacement already starts with stay on screen
+        kept = common_prefix_length(keyword, replacement)
+        payload = replacement[kept:]
+        strategy = TYPE if len(payload) <= direct_typing_max else PASTE
+        return cls(keyword, replacement, PLAIN, problem is None,
+                   len(keyword) - kept + delimiter, strategy, payload)
+
+    def __repr__(self) -> str:
+        return (f"ShortcutRecord({self.keyword!r}, kind={self.kind}, valid={self.valid}, "
+                f"backspaces={self.backspaces}, strategy={self.strategy}, service_id={self.service_id})")
+
+
+@dataclass(frozen=True)
+class ShortcutIndex:
+    """Immutable snapshot of the loaded shortcuts and service triggers.
+
+    The engine publishes a new instance on reload by swapping one reference,
+    so the hook and worker threads read it without taking any lock.
+    """
+    matcher: KeywordTrie
+    replacements: Mapping[str, str]
+    # Service trigger shortcut -> service id; a trigger wins over a replacement row
+    services: Mapping[str, int] = field(default_factory=dict)
+    instant: bool = False
+    shadowed: Tuple[ShadowedKeyword, ...] = ()
+    # Compiled per keyword at load; invalid entries keep a record but never match
+    records: Mapping[str, ShortcutRecord] = field(default_factory=dict)
+    rejected: Mapping[str, str] = field(default_factory=dict)
+    direct_typing_max: int = 0
+    validator: Optional[ShortcutValidator] = field(default=None, compare=False, repr=False)
+
+    @property
+    def credential_keywords(self) -> FrozenSet[str]:
+        return frozenset(self.services)
+
+    @classmethod
+    def build(cls, shortcuts: Dict[str, str], services: Optional[Mapping[str, int]] = None,
+              instant: bool = False,
+              validator: Optional[ShortcutValidator] = None,
+              direct_typing_max: int = 0) -> 'ShortcutIndex':
+        """Compile shortcuts and service triggers into a new snapshot"""
+        services = dict(services or {})
+        matcher = KeywordAutomaton() if instant else KeywordTrie()
+        index = cls(
+            matcher=matcher,
+            replacements=MappingProxyType(dict(shortcuts)),
+            services=MappingProxyType(services),
+            instant=instant,
+            direct_typing_max=direct_typing_max,
+            validator=validator,
+        )
+        records: Dict[str, ShortcutRecord] = {}
+        rejected: Dict[str, str] = {}
+        keywords = list(shortcuts) + [keyword for keyword in services if keyword not in shortcuts]
+        index._recompile(keywords, shortcuts, services, records, rejected)
+        shadowed = ()
+        if instant:
+            matcher.compile()
+            shadowed = tuple(find_shadowed_keywords(matcher))
+        return replace(index, shadowed=shadowed,
+                       records=MappingProxyType(records), rejected=MappingProxyType(rejected))
+
+    @classmethod
+    def empty(cls, instant: bool = False) -> 'ShortcutIndex':
+        return cls.build({}, instant=instant)
+
+    def _recompile(self, keywords: Iterable[str], replacements: Mapping[str, str],
+                   services: Mapping[str, int], records: Dict[str, ShortcutRecord],
+                   rejected: Dict[str, str]) -> None:
+        """Bring the records and matcher entries of the given keywords up to date.
+
+        Every keyword is validated before the matcher is touched, so a
+        validator that raises leaves the shared matcher as it was.
+        """
+        compiled = []
+        for keyword in keywords:
+            service_id = services.get(keyword)
+            replacement = None if service_id is not None else replacements.get(keyword)
+            if service_id is None and replacement is None:
+                compiled.append((keyword, None, None))
+                continue
+            problem = self.validator(keyword, replacement) if self.validator else None
+            record = ShortcutRecord.compile(
+                keyword, replacement, self.instant, self.direct_typing_max, problem, service_id
+            )
+            compiled.append((keyword, record, problem))
+        for keyword, record, problem in compiled:
+            rejected.pop(keyword, None)
+            if record is None:
+                records.pop(keyword, None)
+                self.matcher.discard(keyword)
+                continue
+            records[keyword] = record
+            if problem is None:
+                self.matcher.add(keyword)
+            else:
+                rejected[keyword] = problem
+                self.matcher.discard(keyword)
+
+    def _derive(self, keywords: Iterable[str], replacements: Dict[str, str],
+                services: Dict[str, int]) -> 'ShortcutIndex':
+        """Snapshot sharing this one's matcher, patched in place for the given keywords.
+
+        Matcher states are append-only, so readers still holding this
+        snapshot keep stepping through valid states; only the mappings are
+        copied. The automaton relinks and re-checks shadowing only around the
+        changed keywords instead of recompiling.
+        """
+        keywords = list(keywords)
+        records = dict(self.records)
+        rejected = dict(self.rejected)
+        self._recompile(keywords, replacements, services, records, rejected)
+        shadowed = self.shadowed
+        if isinstance(self.matcher, KeywordAutomaton):
+            self.matcher.relink(keywords)
+            shadowed = tuple(update_shadowed_keywords(self.matcher, self.shadowed, keywords))
+        return replace(
+            self,
+            replacements=MappingProxyType(replacements),
+            services=MappingProxyType(services),
+            shadowed=shadowed,
+            records=MappingProxyType(records),
+            rejected=MappingProxyType(rejected),
+        )
+
+    def with_changes(self, changes: Mapping[str, Optional[str]]) -> 'ShortcutIndex':
+        """Derive a snapshot with shortcuts upserted, or removed when mapped to None"""
+        replacements = dict(self.replacements)
+        for keyword, replacement in changes.items():
+            if replacement is None:
+                replacements.pop(keyword, None)
+            else:
+                replacements[keyword] = replacement
+        return self._derive(changes, replacements, dict(self.services))
+
+    def with_services(self, services: Mapping[str, int]) -> 'ShortcutIndex':
+        """Derive a snapshot whose service triggers are exactly `services`"""
+        services = dict(services)
+        changed = {
+            keyword for keyword in set(self.services) | set(services)
+            if self.services.get(keyword) != services.get(keyword)
+        }
+        return self._derive(changed, dict(self.replacements), services)
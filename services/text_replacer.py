@@ -1,78 +1,72 @@
+import sys
 import threading
-from collections import deque
-import keyboard
 import time
-from typing import Dict, Optional, Callable, Set, List
+from typing import Dict, Optional, Callable, FrozenSet, List, Mapping, NamedTuple, Set, Tuple
 from concurrent.futures import ThreadPoolExecutor
 import queue
+from collections import deque
 from config import Config
 from utils.logger import Logger
-import ctypes
-from ctypes import wintypes
-import win32clipboard
-import win32con
-
-KEYEVENTF_KEYUP = 0x0002
-INPUT_KEYBOARD = 1
-
-# Windows API Structures
-class KEYBDINPUT(ctypes.Structure):
-    _fields_ = [
-        ("wVk", wintypes.WORD),
-        ("wScan", wintypes.WORD),
-        ("dwFlags", wintypes.DWORD),
-        ("time", wintypes.DWORD),
-        ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
-    ]
-
-class INPUT_UNION(ctypes.Union):
-    _fields_ = [
-        ("ki", KEYBDINPUT),
-        ("padding", ctypes.c_byte * 32)
-    ]
-
-class INPUT(ctypes.Structure):
-    _fields_ = [
-        ("type", wintypes.DWORD),
-        ("union", INPUT_UNION)
-    ]
-
-class ReplacementCache:
-    def __init__(self, max_size: int = 1000):
-        self.max_size = max_size
-        self.cache: Dict[str, str] = {}
-        self.access_count: Dict[str, int] = {}
-        self._lock = threading.RLock()
-
-    def get(self, key: str) -> Optional[str]:
-        with self._lock:
-            if key in self.cache:
-                self.access_count[key] += 1
-                return self.cache[key]
-            return None
-
-    def set(self, key: str, value: str) -> None:
-        with self._lock:
-            if len(self.cache) >= self.max_size:
-                lfu_key = min(self.access_count.items(), key=lambda x: x[1])[0]
-                del self.cache[lfu_key]
-                del self.access_count[lfu_key]
-            self.cache[key] = value
-            self.access_count[key] = 1
+from utils.metrics import CallbackWatchdog, LatencyRecorder
+from services.backends import ClipboardError, InputBackend, create_default_backend
+from services.clipboard_restore import DeferredClipboardRestore, PendingRestore
+from services.credential_rotation import CredentialRotation
+from services.database import DatabaseManager
+from services.health import CLIPBOARD, DATABASE, HOOK, INJECTOR, WORKER, ServiceHealth
+from services.matcher import ShadowedKeyword, TrieCursor
+from services.memory import MemoryBudget, deep_sizeof
+from services.scheduler import TaskScheduler, shared_scheduler
+from services.shortcut_index import CREDENTIAL, TYPE, ShortcutIndex
+from services.timing import AdaptiveTimingController, TimingProfile
+
+# Queued after the last word to shut the replacement workers down
+_STOP = object()
+# How long an expected echo of our own injected keys stays valid
+ECHO_TIMEOUT = 1.0
+# Bound once so the key handler skips the attribute lookup
+_perf_counter_ns = time.perf_counter_ns
+
+
+class PreparedExpansion(NamedTuple):
+    """A matched keyword resolved and validated, ready to inject"""
+    typed_word: str
+    replacement: Optional[str]
+    # What is actually sent, after the characters left in place
+    payload: Optional[str]
+    backspaces: int
+    direct: bool
+    queued_ns: int
+    # Service triggers take their credential at injection, so a dropped or
+    # failed expansion never consumes one; replacement and payload are None until then
+    service_id: Optional[int] = None
 
-    def clear(self) -> None:
-        with self._lock:
-            self.cache.clear()
-            self.access_count.clear()
 
 class TextReplacer:
-    def __init__(self):
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 backend: Optional[InputBackend] = None,
+                 scheduler: Optional[TaskScheduler] = None):
         # Basic setup
-        self.typed_buffer = deque(maxlen=Config.MAX_BUFFER_SIZE)
+        # Key hook, keystroke injection and clipboard are platform specific
+        self.backend = backend or create_default_backend()
+        # Reuse the application's connection; schema setup must not run per expansion
+        self.db = db_manager or DatabaseManager()
+        # Periodic and delayed work shares the application's scheduler thread
+        self.scheduler = scheduler or shared_scheduler()
+        self.credential_rotation = CredentialRotation(
+            self.db, self.scheduler, content_filter=self.credential_is_valid
+        )
+        self.db.on_credentials_changed = self.credential_rotation.invalidate
+        self.db.on_services_changed = self.reload_services
+        # Serializes index rebuilds; readers use the published snapshot instead
         self.replacements_lock = threading.RLock()
         self.clipboard_lock = threading.Lock()
-        self.words_to_replace: Dict[str, str] = {}
-        self.word_prefixes: Set[str] = set()
+        self.clipboard_restore = DeferredClipboardRestore(
+            self._restore_clipboard, self.clipboard_lock, self.scheduler
+        )
+        self.instant_expand = Config.INSTANT_EXPAND
+        self.index = ShortcutIndex.empty(self.instant_expand)
+        self.key_cursor = TrieCursor(self.index.matcher, Config.MAX_BUFFER_SIZE)
+        self._cursor_reset_requested = False
         self.is_running = False
         self.is_replacing = False
         self.logger = Logger(__name__)
@@ -81,16 +75,21 @@ class TextReplacer:
         self.on_status_change: Optional[Callable[[bool], None]] = None
         self.on_replacement: Optional[Callable[[str, str], None]] = None
 
-        # Caches
-        self.credential_keywords: Set[str] = set()
-        self.replacements_cache = ReplacementCache(max_size=1000)
-        self.credentials_cache = ReplacementCache(max_size=100)
-        self.clipboard_cache = None
+        # (clipboard sequence number, text) captured at that sequence
+        self.clipboard_cache: Optional[Tuple[int, Optional[str]]] = None
 
         # Threading
+        # Matched words flow hook -> replacement_queue -> preparation -> injection_queue -> injection
+        self.hook_watchdog = CallbackWatchdog(Config.HOOK_BUDGET_US * 1000)
         self.replacement_queue = queue.Queue()
+        self.injection_queue = queue.Queue()
+        self.preparation_thread = None
         self.replacement_thread = None
+        # (key name, deadline) of injected keys the hook will see again
+        self._echoes = deque()
         self.executor = ThreadPoolExecutor(max_workers=2)
+        # Set on stop; background loops wait on it instead of sleeping
+        self._stop_event = threading.Event()
 
         # Timing and delays
         self.last_key_time = 0
@@ -98,6 +97,8 @@ class TextReplacer:
         self.replacement_delay = 0.05
         self.backspace_delay = 0.001
         self.paste_delay = 0.05
+        # Off the critical path, so never shorter than the untuned paste delay
+        self.clipboard_restore_delay = max(Config.CLIPBOARD_RESTORE_DELAY, self.paste_delay)
         self.last_replacement_time = 0
         self.min_replacement_interval = 0.1
 
@@ -105,15 +106,44 @@ class TextReplacer:
         self.clipboard_retry_count = 5
         self.clipboard_base_delay = 0.05
         self.clipboard_timeout = 1.0  # 1 second total timeout
+        self.clipboard_mismatches = 0
+        # Captures served from clipboard_cache; only real reads land in the clipboard_read span
+        self.clipboard_cache_hits = 0
+        self.restore_retries = 0
+
+        # The fixed delays above are the ceiling adaptive timing learns down from
+        self.timing = None
+        if Config.ADAPTIVE_TIMING:
+            self.timing = AdaptiveTimingController(TimingProfile(
+                settle=self.replacement_delay,
+                backspace=self.backspace_delay,
+                paste=self.paste_delay,
+                interval=self.min_replacement_interval,
+            ))
 
         # Recovery and health
         self.max_retries = 3
         self.service_healthy = True
         self.health_check_interval = 60
-        self.health_check_thread = None
+        self.health_check_task = None
         self.max_consecutive_errors = 3
         self.error_recovery_delay = 1.0
         self.last_successful_replacement = time.time()
+        self.health = ServiceHealth(error_threshold=self.max_consecutive_errors)
+        # Components with a recovery queued on the scheduler
+        self._recovering: Set[str] = set()
+        self._restart_lock = threading.Lock()
+
+        # Expansion counters
+        self.expansions_queued = 0
+        self.expansions_processed = 0
+        self.expansions_completed = 0
+        self.expansions_deferred = 0
+        self.expansions_dropped = 0
+        self.expansions_failed = 0
+        self.echoes_filtered = 0
+        # Per-phase perform_replacement spans (clipboard, injection, restore)
+        self.latency = LatencyRecorder()
 
         # Resource management
         self.max_queue_size = 1000
@@ -121,9 +151,20 @@ class TextReplacer:
         self.max_replacement_length = 10000
         self.max_shortcut_length = 50
         self.resource_check_interval = 60
+        self.resource_check_task = None
         self.last_resource_check = time.time()
         self.memory_usage = 0
         self.queue_usage = 0
+        self.memory = MemoryBudget(Config.MEMORY_BUDGET_BYTES)
+        self._index_size: Tuple[Optional[ShortcutIndex], int] = (None, 0)
+        # Only the credential rings can shrink; trimmed services reload on their next dispense
+        self.memory.register('credential_rings', self.credential_rotation.measure,
+                             self.credential_rotation.trim)
+        self.memory.register('index', self.measure_index)
+        self.memory.register('queues', self.measure_queues)
+        self.memory.register('key_buffer', lambda: deep_sizeof(self.key_cursor, exclude=(self.key_cursor.trie,)))
+        self.memory.register('echoes', lambda: deep_sizeof(self._echoes))
+        self.memory.register('latency', lambda: deep_sizeof(self.latency.histograms))
 
         # Input validation
         self.valid_chars = set(
@@ -135,199 +176,306 @@ class TextReplacer:
         )
         self.blocked_chars = set('\x00\x01\x02\x03\x04')
 
-        # Windows API
-        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
-        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
-        
         # Initialize
         self.attach_thread_input()
-        self.vk_map = self.initialize_vk_map()
         self.load_replacements()
 
-    def initialize_vk_map(self) -> Dict[str, int]:
-        vk_map = {}
-        for i in range(26):
-            vk_map[chr(65 + i).lower()] = ord('A') + i
-        for i in range(10):
-            vk_map[str(i)] = ord('0') + i
-        navigation_keys = {
-            'left': win32con.VK_LEFT,
-            'right': win32con.VK_RIGHT,
-            'up': win32con.VK_UP,
-            'down': win32con.VK_DOWN,
-            'home': win32con.VK_HOME,
-            'end': win32con.VK_END,
-            'page_up': win32con.VK_PRIOR,
-            'page_down': win32con.VK_NEXT
+    @property
+    def words_to_replace(self) -> Mapping[str, str]:
+        return self.index.replacements
+
+    @property
+    def credential_keywords(self) -> FrozenSet[str]:
+        return self.index.credential_keywords
+
+    @property
+    def shadowed_keywords(self) -> List[ShadowedKeyword]:
+        return list(self.index.shadowed)
+
+    def get_expansion_stats(self) -> Dict[str, int]:
+        return {
+            'queued': self.expansions_queued,
+            'processed': self.expansions_processed,
+            'completed': self.expansions_completed,
+            'deferred': self.expansions_deferred,
+            'dropped': self.expansions_dropped,
+            'failed': self.expansions_failed,
+            'echoes_filtered': self.echoes_filtered,
+            'clipboard_cache_hits': self.clipboard_cache_hits,
         }
-        control_keys = {
-            'backspace': win32con.VK_BACK,
-            'tab': win32con.VK_TAB,
-            'return': win32con.VK_RETURN,
-            'enter': win32con.VK_RETURN,
-            'shift': win32con.VK_SHIFT,
-            'ctrl': win32con.VK_CONTROL,
-            'alt': win32con.VK_MENU,
-            'pause': win32con.VK_PAUSE,
-            'caps_lock': win32con.VK_CAPITAL,
-            'escape': win32con.VK_ESCAPE,
-            'space': win32con.VK_SPACE,
-            'delete': win32con.VK_DELETE,
-            'insert': win32con.VK_INSERT
-        }
-        for i in range(1, 13):
-            control_keys[f'f{i}'] = getattr(win32con, f'VK_F{i}')
-        vk_map.update(navigation_keys)
-        vk_map.update(control_keys)
-        return vk_map
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        return self.latency.summary()
+
+    def dump_latency_stats(self, path: str) -> None:
+        self.latency.dump(path)
+
+    def get_database_stats(self) -> Dict[str, float]:
+        return DatabaseManager.get_connection_stats()
+
+    def check_input(self, text: str, is_shortcut: bool = False) -> Tuple[bool, Optional[str]]:
+        """Validate a shortcut or replacement without logging; returns (valid, reason)"""
+        if not text:
+            return False, "Text is empty"
+        max_len = self.max_shortcut_length if is_shortcut else self.max_replacement_length
+        if len(text) > max_len:
+            return False, f"Text too long: {len(text)} chars (max {max_len})"
+        if is_shortcut:
+            if not all(char in self.valid_chars for char in text):
+                return False, "Shortcut contains invalid characters"
+            if text.isspace():
+                return False, "Shortcut cannot be only whitespace"
+            if text[0].isspace() or text[-1].isspace():
+                return False, "Shortcut cannot start/end with space"
+        elif any(char in self.blocked_chars for char in text):
+            return False, "Text contains blocked characters"
+        return True, None
 
     def validate_input(self, text: str, is_shortcut: bool = False) -> bool:
         try:
-            if not text:
-                return False
-            max_len = self.max_shortcut_length if is_shortcut else self.max_replacement_length
-            if len(text) > max_len:
-                self.logger.warning(f"Text too long: {len(text)} chars (max {max_len})")
-                return False
-            if is_shortcut:
-                if not all(char in self.valid_chars for char in text):
-                    self.logger.warning("Shortcut contains invalid characters")
-                    return False
-                if text.isspace():
-                    self.logger.warning("Shortcut cannot be only whitespace")
-                    return False
-                if text[0].isspace() or text[-1].isspace():
-                    self.logger.warning("Shortcut cannot start/end with space")
-                    return False
-            else:
-                if any(char in self.blocked_chars for char in text):
-                    self.logger.warning("Text contains blocked characters")
-                    return False
-            return True
+            valid, reason = self.check_input(text, is_shortcut)
+            if not valid:
+                self.logger.warning(reason)
+            return valid
         except Exception as e:
             self.logger.error(f"Input validation error: {e}")
             return False
 
+    def shortcut_problem(self, keyword: str, replacement: Optional[str]) -> Optional[str]:
+        """Why a shortcut cannot be expanded, or None; credentials are checked when loaded"""
+        valid, reason = self.check_input(keyword, is_shortcut=True)
+        if valid and replacement is not None:
+            valid, reason = self.check_input(replacement)
+        return reason
+
+    def credential_is_valid(self, content: str) -> bool:
+        return self.check_input(content)[0]
+
+    def direct_typing_max(self) -> int:
+        """Longest payload typed as Unicode key events; 0 when the injector cannot"""
+        return Config.DIRECT_TYPING_MAX_LENGTH if self.backend.injector.supports_unicode else 0
+
 
     def on_key_event(self, event) -> None:
+        """Key handler, run on the keyboard library's dispatch thread.
+
+        The OS hook callback only queues the event for that thread, so time
+        spent here never blocks system input; it delays the keys queued
+        behind this one. The watchdog records handlers over budget. This is
+        the only thread that touches the key cursor; others request a reset.
+        """
+        started = _perf_counter_ns()
         if not self.is_running:
             return
+        self.health.hook_beat = time.monotonic()
+        if self.backend.keys.is_probe(event):
+            self.health.probe_answered()
+            return
         try:
+            if self._cursor_reset_requested:
+                self._cursor_reset_requested = False
+                self.key_cursor.reset()
             if event.event_type == 'down':
-                if self.is_replacing:
+                if self._echoes and self._consume_echo(event.name):
                     return
+                index = self.index
+                if self.key_cursor.trie is not index.matcher:
+                    self.key_cursor.reset(index.matcher)
                 if event.name in ('space', 'enter'):
-                    current_word = ''.join(self.typed_buffer)
-                    if current_word in self.words_to_replace:
-                        self.replacement_queue.put_nowait(current_word)
-                    else:
-                        print(f"No match found for: '{current_word}'")
-                    self.typed_buffer.clear()
-                    
-                elif event.name == 'backspace' and self.typed_buffer:
-                    self.typed_buffer.pop()
+                    if not index.instant:
+                        current_word = self.key_cursor.match()
+                        if current_word is not None:
+                            self.replacement_queue.put_nowait((current_word, started))
+                            self.expansions_queued += 1
+                    self.key_cursor.reset()
+                elif event.name == 'backspace':
+                    self.key_cursor.pop()
                 elif len(event.name) == 1 and event.name.isprintable():
-                    if len(self.typed_buffer) < self.max_buffer_size:
-                        self.typed_buffer.append(event.name)
+                    self.key_cursor.push(event.name)
+                    if index.instant:
+                        current_word = self.key_cursor.match()
+                        if current_word is not None:
+                            self.replacement_queue.put_nowait((current_word, started))
+                            self.expansions_queued += 1
+                            self.key_cursor.reset()
         except Exception as e:
             self.logger.error(f"Key event error: {e}")
-            self.typed_buffer.clear()
+            self.key_cursor.reset()
+        finally:
+            elapsed = _perf_counter_ns() - started
+            if elapsed > self.hook_watchdog.budget_ns:
+                self.hook_watchdog.record(elapsed)
+
+    def request_cursor_reset(self) -> None:
+        """Forget the typed word before the next key; safe from any thread"""
+        self._cursor_reset_requested = True
+
+    def get_hook_stats(self) -> Dict[str, object]:
+        return {'watchdog': self.hook_watchdog.stats()}
+
+    def expect_echoes(self, names: List[str]) -> None:
+        """Register injected key presses so the hook skips them instead of matching them"""
+        if self.backend.injector.echoes_injected_keys:
+            deadline = time.monotonic() + ECHO_TIMEOUT
+            self._echoes.extend((name, deadline) for name in names)
+
+    def _consume_echo(self, name: str) -> bool:
+        echoes = self._echoes
+        now = time.monotonic()
+        while echoes and echoes[0][1] < now:
+            echoes.popleft()
+        if echoes and echoes[0][0] == name:
+            echoes.popleft()
+            self.echoes_filtered += 1
+            return True
+        return False
 
     def attach_thread_input(self) -> None:
         try:
-            foreground_window = self.user32.GetForegroundWindow()
-            if foreground_window:
-                target_thread = self.user32.GetWindowThreadProcessId(foreground_window, None)
-                current_thread = self.kernel32.GetCurrentThreadId()
-                self.user32.AttachThreadInput(current_thread, target_thread, True)
+            self.backend.injector.attach()
         except Exception as e:
             self.logger.error(f"Failed to attach thread input: {e}")
 
-    def send_virtual_input(self, inputs: List[INPUT]) -> None:
-        if not inputs:
-            return
-        num_inputs = len(inputs)
-        input_array = (INPUT * num_inputs)(*inputs)
-        result = self.user32.SendInput(num_inputs, input_array, ctypes.sizeof(INPUT))
-        if result != num_inputs:
-            error = ctypes.get_last_error()
-            raise TextReplacerError(f"SendInput failed with error: {error}")
-
-    def create_input_structure(self, vk: int, flags: int = 0) -> INPUT:
-        input_struct = INPUT()
-        input_struct.type = INPUT_KEYBOARD
-        input_struct.union.ki.wVk = vk
-        input_struct.union.ki.dwFlags = flags
-        input_struct.union.ki.dwExtraInfo = ctypes.pointer(ctypes.c_ulong(0))
-        return input_struct
-
     def check_resources(self) -> bool:
         try:
-            current_time = time.time()
-            if current_time - self.last_resource_check < self.resource_check_interval:
-                return True
-            self.last_resource_check = current_time
+            self.last_resource_check = time.time()
             self.queue_usage = self.replacement_queue.qsize()
             if self.queue_usage > self.max_queue_size:
                 self.logger.warning(f"Queue size exceeded: {self.queue_usage}")
                 self.clear_queue()
                 return False
-            if len(self.typed_buffer) > self.max_buffer_size:
-                self.logger.warning(f"Buffer size exceeded: {len(self.typed_buffer)}")
-                self.typed_buffer.clear()
+            if len(self.key_cursor) > self.max_buffer_size:
+                self.logger.warning(f"Buffer size exceeded: {len(self.key_cursor)}")
+                self.request_cursor_reset()
                 return False
-            cache_size = (
-                len(self.replacements_cache.cache) + 
-                len(self.credentials_cache.cache)
-            )
-            if cache_size > self.max_queue_size:
-                self.logger.warning(f"Cache size exceeded: {cache_size}")
-                self.clear_caches()
-                return False
-            return True
+            self.memory_usage = self.memory.enforce()
+            return self.memory_usage <= self.memory.budget_bytes
 
         except Exception as e:
             self.logger.error(f"Resource check error: {e}")
             return False
 
+    def measure_index(self) -> int:
+        """Bytes held by the compiled index, measured once per published snapshot"""
+        index = self.index
+        if self._index_size[0] is not index:
+            self._index_size = (index, deep_sizeof(index))
+        return self._index_size[1]
+
+    def measure_queues(self) -> int:
+        total = 0
+        for pending in (self.replacement_queue, self.injection_queue):
+            with pending.mutex:
+                items = list(pending.queue)
+            total += sys.getsizeof(pending.queue) + deep_sizeof(items) - sys.getsizeof(items)
+        return total
+
+    def get_memory_stats(self) -> Dict[str, object]:
+        return self.memory.get_stats()
+
+    def start_resource_monitoring(self) -> None:
+        self.resource_check_task = self.scheduler.call_every(
+            self.resource_check_interval, self.check_resources, name='resource-check', jitter=0.1,
+            background=True
+        )
+
     def start_health_monitoring(self) -> None:
-        self.health_check_thread = threading.Thread(
-            target=self._monitor_health,
-            daemon=True
+        self.health_check_task = self.scheduler.call_every(
+            self.health_check_interval, self.check_health, name='health-check', jitter=0.1,
+            background=True
         )
-        self.health_check_thread.start()
 
-    def _monitor_health(self) -> None:
-        while self.is_running:
+    def check_health(self) -> None:
+        """Recover only the components that stopped working; an idle engine touches nothing"""
+        try:
+            workers_alive = all(
+                worker is not None and worker.is_alive()
+                for worker in (self.preparation_thread, self.replacement_thread)
+            )
+            failed = self.health.check(workers_alive)
+            self.service_healthy = not failed
+            if WORKER in failed:
+                # A dead or wedged worker cannot be repaired in place
+                self.logger.warning("Replacement workers stopped responding")
+                self.restart_service()
+                return
+            for component in failed:
+                self.recover_component(component)
+            if HOOK not in failed:
+                self.probe_hook()
+        except Exception as e:
+            self.logger.error(f"Health monitor error: {e}")
+
+    def probe_hook(self) -> None:
+        """Inject a probe key when input bypassed the hook, and recover the hook if it is lost"""
+        if not self.health.should_probe(self.backend.keys.input_idle_time()):
+            return
+        self.health.probe_started()
+        if not self.backend.keys.send_probe():
+            self.health.probe_answered()
+            return
+        self.scheduler.call_later(self.health.probe_timeout, self.check_hook_probe,
+                                  name='hook-probe', background=True)
+
+    def check_hook_probe(self) -> None:
+        if self.is_running and self.health.probe_lost():
+            self.logger.warning("Probe key never reached the hook")
+            self.recover_component(HOOK)
+
+    def get_credential_stats(self) -> Dict[str, object]:
+        return self.credential_rotation.get_stats()
+
+    def get_health_stats(self) -> Dict[str, object]:
+        return self.health.get_stats()
+
+    def get_scheduler_stats(self) -> Dict[str, Dict[str, float]]:
+        return self.scheduler.get_stats()
+
+    def schedule_recovery(self, component: str) -> None:
+        """Run recover_component on the scheduler's workers.
+
+        A failed recovery restarts the service, which must not run on the
+        worker threads that stop() joins and start() replaces.
+        """
+        if component in self._recovering:
+            return
+        self._recovering.add(component)
+
+        def recover():
             try:
-                time.sleep(self.health_check_interval)
-                if not self.service_healthy:
-                    self.logger.warning("Service marked as unhealthy")
-                    self.attempt_service_recovery()
-                    continue
-                current_time = time.time()
-                time_since_last_replacement = current_time - self.last_successful_replacement
-                if time_since_last_replacement > self.health_check_interval * 2:
-                    self.logger.warning(f"No successful replacements for {time_since_last_replacement:.1f} seconds")
-                    self.attempt_service_recovery() 
-            except Exception as e:
-                self.logger.error(f"Health monitor error: {e}")
+                self.recover_component(component)
+            finally:
+                self._recovering.discard(component)
+
+        self.scheduler.call_later(0, recover, name='recovery', background=True)
 
-    def attempt_service_recovery(self) -> None:
+    def recover_component(self, component: str) -> None:
+        self.logger.warning(f"Recovering {component}")
         try:
-            self.logger.info("Starting service recovery")
-            self.typed_buffer.clear()
-            self.clipboard_cache = None
-            self.clear_queue()
-            self.load_replacements()
-            self.attach_thread_input()
-            self.logger.info("Service recovery completed")
+            if component == HOOK:
+                # Keys typed while the hook was gone never reached the cursor
+                self.backend.keys.reinstall()
+                self.request_cursor_reset()
+            elif component == INJECTOR:
+                self.backend.injector.detach()
+                self.attach_thread_input()
+            elif component == CLIPBOARD:
+                self.clipboard_cache = None
+            elif component == DATABASE:
+                self.load_replacements()
+            else:
+                self.request_cursor_reset()
+                self.clear_queue()
+            self.health.recovered(component)
             self.service_healthy = True
         except Exception as e:
-            self.logger.error(f"Service recovery failed: {e}")
+            self.logger.error(f"Recovery of {component} failed: {e}")
             self.restart_service()
 
     def restart_service(self) -> None:
+        if not self._restart_lock.acquire(blocking=False):
+            self.logger.info("Service restart already in progress")
+            return
         try:
             self.stop()
             time.sleep(1)
@@ -338,297 +486,468 @@ class TextReplacer:
             self.is_running = False
             if self.on_status_change:
                 self.on_status_change(False)
+        finally:
+            self._restart_lock.release()
 
     def clear_queue(self) -> None:
         try:
-            while not self.replacement_queue.empty():
-                try:
-                    self.replacement_queue.get_nowait()
-                except queue.Empty:
-                    break
+            for pending in (self.replacement_queue, self.injection_queue):
+                while not pending.empty():
+                    try:
+                        item = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        pending.put(_STOP)
+                        break
+                    self.expansions_dropped += 1
             self.logger.info("Replacement queue cleared")
         except Exception as e:
             self.logger.error(f"Failed to clear queue: {e}")
 
     def clear_caches(self) -> None:
         try:
-            self.replacements_cache.clear()
-            self.credentials_cache.clear()
             self.clipboard_cache = None
+            self.request_cursor_reset()
             self.logger.info("All caches cleared")
         except Exception as e:
             self.logger.error(f"Failed to clear caches: {e}")
 
-    def process_replacement_queue(self) -> None:
-        consecutive_errors = 0
-        while self.is_running:
+    def process_preparation_queue(self, pending: queue.Queue, prepared_queue: queue.Queue) -> None:
+        """First pipeline stage: resolve the next words while the previous one is injected.
+
+        Each start hands its workers their own queues, so a stop sentinel
+        only ever reaches the threads of the start it was queued for.
+        """
+        while True:
+            item = pending.get()
+            if item is _STOP:
+                prepared_queue.put(_STOP)
+                break
+            typed_word, queued_ns = item
+            self.health.busy('prepare')
             try:
-                if not self.check_resources():
-                    self.logger.warning("Resource check failed, waiting before continuing")
-                    time.sleep(1)
-                    continue
-                typed_word = self.replacement_queue.get(timeout=0.1)
-                if typed_word == "STOP":
+                prepared = self.prepare(typed_word, queued_ns)
+            except Exception as e:
+                self.logger.error(f"Failed to prepare '{typed_word}': {e}")
+                prepared = None
+                self.expansions_failed += 1
+                self.health.record_error(e)
+            finally:
+                self.health.idle('prepare')
+            if prepared is None:
+                self.expansions_processed += 1
+            else:
+                prepared_queue.put(prepared)
+
+    def process_replacement_queue(self, prepared_queue: queue.Queue, stop_event: threading.Event) -> None:
+        """Injection stage; blocks until a prepared expansion or the stop sentinel arrives"""
+        while True:
+            try:
+                prepared = prepared_queue.get()
+                if prepared is _STOP:
                     break
-                if not self.validate_input(typed_word, is_shortcut=True):
-                    self.logger.warning(f"Invalid shortcut rejected: {typed_word}")
-                    continue
-                replacement = None
-                with self.replacements_lock:
-                    if typed_word in self.credential_keywords:
-                        replacement = self.credentials_cache.get(typed_word)
-                        if replacement is None:
-                            replacement = self.get_next_credential(typed_word)
-                    else:
-                        replacement = self.replacements_cache.get(typed_word)
-                        if replacement is None:
-                            replacement = self.words_to_replace.get(typed_word)
-                            if replacement:
-                                self.replacements_cache.set(typed_word, replacement)
-                if replacement:
-                    if not self.validate_input(replacement):
-                        self.logger.warning(f"Invalid replacement rejected for {typed_word}")
-                        continue
-                    self.perform_replacement(typed_word, replacement)
-                    consecutive_errors = 0
-                    self.last_successful_replacement = time.time()
-                    self.service_healthy = True
-            except queue.Empty:
-                continue
+                self.health.busy('inject')
+                try:
+                    self.latency.record('queue_wait', prepared.queued_ns)
+                    self.inject(prepared)
+                finally:
+                    self.health.idle('inject')
+                    self.expansions_processed += 1
+                    self.latency.record('end_to_end', prepared.queued_ns)
             except Exception as e:
-                consecutive_errors += 1
-                self.logger.error(f"Error in replacement queue (attempt {consecutive_errors}): {e}")
-                if consecutive_errors >= self.max_consecutive_errors:
-                    self.logger.critical("Too many consecutive errors, attempting service recovery")
+                self.expansions_failed += 1
+                component = self.health.record_error(e)
+                self.logger.error(f"Error in replacement queue ({component}): {e}")
+                if self.health.failing(component):
+                    self.logger.critical(f"Too many consecutive {component} errors, attempting recovery")
                     self.service_healthy = False
-                    self.attempt_service_recovery()
-                    consecutive_errors = 0
-                time.sleep(self.error_recovery_delay)
+                    self.schedule_recovery(component)
+                stop_event.wait(self.error_recovery_delay)
 
-    def get_next_credential(self, keyword: str) -> Optional[str]:
+    def prepare(self, typed_word: str, queued_ns: int = 0) -> Optional[PreparedExpansion]:
+        """Resolve a matched keyword from its compiled record; None when there is nothing to inject"""
+        record = self.index.records.get(typed_word)
+        if record is None or not record.valid:
+            return None
+        if record.kind == CREDENTIAL:
+            return PreparedExpansion(typed_word, None, None, record.backspaces, False, queued_ns,
+                                     record.service_id)
+        return PreparedExpansion(typed_word, record.replacement, record.payload, record.backspaces,
+                                 record.strategy == TYPE, queued_ns)
+
+    def inject(self, prepared: PreparedExpansion) -> bool:
+        """Replace the typed word; False when a service has no credential to hand out"""
+        credential = None
+        if prepared.service_id is not None:
+            credential = self.take_credential(prepared.service_id)
+            if credential is None:
+                return False
+            content = credential[1]
+            prepared = prepared._replace(replacement=content, payload=content,
+                                         direct=self.uses_direct_typing(content))
+        try:
+            self.perform_replacement(prepared)
+        except Exception:
+            if credential is not None:
+                self.credential_rotation.give_back(prepared.service_id, credential)
+            raise
+        self.health.record_success()
+        return True
+
+    def expand(self, typed_word: str) -> bool:
+        """Resolve a matched keyword and replace it on screen, bypassing the queues"""
+        prepared = self.prepare(typed_word)
+        if prepared is None:
+            return False
+        return self.inject(prepared)
+
+    def take_credential(self, service_id: int) -> Optional[Tuple[int, str]]:
         try:
-            from services.database import DatabaseManager
-            db = DatabaseManager()
-            return db.get_next_credential(keyword)
+            return self.credential_rotation.take(service_id)
         except Exception as e:
+            self.health.record_error(e)
             self.logger.error(f"Failed to get next credential: {str(e)}")
             return None
         
-    def get_clipboard_text(self) -> str:
-        max_attempts = 5
-        base_delay = 0.05
+    def read_clipboard(self) -> Optional[str]:
+        """Clipboard text, or None when it holds no text"""
+        max_attempts = self.clipboard_retry_count
         for attempt in range(max_attempts):
             try:
-                try:
-                    win32clipboard.CloseClipboard()
-                except:
-                    pass
                 if attempt > 0:
-                    time.sleep(base_delay * (2 ** attempt))
-                win32clipboard.OpenClipboard(None)
-                if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
-                    text = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
-                    win32clipboard.CloseClipboard()
-                    return text
-                win32clipboard.CloseClipboard()
-                return ""
+                    time.sleep(self.clipboard_base_delay * (2 ** attempt))
+                return self.backend.clipboard.get_text()
             except Exception as e:
                 self.logger.warning(f"Clipboard read attempt {attempt + 1} failed: {e}")
-                try:
-                    win32clipboard.CloseClipboard()
-                except:
-                    pass
-                if attempt == max_attempts - 1:
-                    raise TextReplacerError(f"Failed to access clipboard after {max_attempts} attempts")
-        return ""
+        raise ClipboardError(f"Failed to access clipboard after {max_attempts} attempts")
+
+    def get_clipboard_text(self) -> str:
+        return self.read_clipboard() or ""
+
+    def capture_clipboard(self) -> Optional[str]:
+        """Original clipboard text, re-read only when the clipboard changed since the last capture"""
+        sequence = self.backend.clipboard.sequence_number()
+        cached = self.clipboard_cache
+        if sequence is not None and cached is not None and cached[0] == sequence:
+            self.clipboard_cache_hits += 1
+            return cached[1]
+        started = time.perf_counter_ns()
+        text = self.read_clipboard()
+        self.latency.record('clipboard_read', started)
+        self.clipboard_cache = (sequence, text) if sequence is not None else None
+        return text
 
     def set_clipboard_text(self, text: str) -> None:
-        max_attempts = 5
-        base_delay = 0.05
+        """Write the clipboard, confirmed by its change counter or else by reading it back"""
+        max_attempts = self.clipboard_retry_count
+        clipboard = self.backend.clipboard
         for attempt in range(max_attempts):
             try:
-                try:
-                    win32clipboard.CloseClipboard()
-                except:
-                    pass
                 if attempt > 0:
-                    time.sleep(base_delay * (2 ** attempt))
-                win32clipboard.OpenClipboard(None)
-                win32clipboard.EmptyClipboard()
-                win32clipboard.SetClipboardText(text, win32con.CF_UNICODETEXT)
-                win32clipboard.CloseClipboard()
-                verify_text = self.get_clipboard_text()
-                if verify_text == text:
-                    return
+                    time.sleep(self.clipboard_base_delay * (2 ** attempt))
+                started = time.perf_counter_ns()
+                before = clipboard.sequence_number()
+                clipboard.set_text(text)
+                started = self.latency.record('clipboard_write', started)
+                if before is not None:
+                    if clipboard.sequence_number() != before:
+                        return
+                else:
+                    verify_text = self.get_clipboard_text()
+                    self.latency.record('clipboard_verify', started)
+                    if verify_text == text:
+                        return
+                self.clipboard_mismatches += 1
                 self.logger.warning(f"Clipboard verification failed on attempt {attempt + 1}")
             except Exception as e:
                 self.logger.warning(f"Clipboard write attempt {attempt + 1} failed: {e}")
-                try:
-                    win32clipboard.CloseClipboard()
-                except:
-                    pass
                 if attempt == max_attempts - 1:
-                    raise TextReplacerError(f"Failed to set clipboard after {max_attempts} attempts")
-        raise TextReplacerError("Failed to verify clipboard content")
+                    raise ClipboardError(f"Failed to set clipboard after {max_attempts} attempts")
+        raise ClipboardError("Failed to verify clipboard content")
 
-    def perform_replacement(self, typed_word: str, replacement: str) -> None:
+    def restore_clipboard(self, text: str) -> bool:
+        max_attempts = self.clipboard_retry_count
+        clipboard = self.backend.clipboard
+        for attempt in range(max_attempts):
+            try:
+                if attempt > 0:
+                    self.restore_retries += 1
+                    time.sleep(self.clipboard_base_delay * (2 ** attempt))
+                clipboard.set_text(text)
+                # The clipboard holds the original again; the next capture can skip reading it
+                sequence = clipboard.sequence_number()
+                self.clipboard_cache = (sequence, text) if sequence is not None else None
+                return True
+            except Exception as e:
+                self.logger.warning(f"Clipboard restore attempt {attempt + 1} failed: {e}")
+        self.clipboard_cache = None
+        self.logger.error("Failed to restore clipboard")
+        return False
+
+    def get_timing(self, app: Optional[str] = None) -> TimingProfile:
+        if self.timing:
+            return self.timing.profile(app)
+        return TimingProfile(
+            settle=self.replacement_delay,
+            backspace=self.backspace_delay,
+            paste=self.paste_delay,
+            interval=self.min_replacement_interval,
+        )
+
+    def record_timing_outcome(self, app: Optional[str], succeeded: bool, mismatches: int) -> None:
+        """Feed an expansion's failures back into adaptive timing.
+
+        Getting through without an exception proves nothing about what the
+        target pasted, so successes are only credited by the deferred restore
+        once the clipboard is seen undisturbed (see _restore_clipboard).
+        """
+        if not self.timing:
+            return
+        if not succeeded:
+            self.timing.record_failure(app, 'replacement error')
+        elif self.clipboard_mismatches > mismatches:
+            self.timing.record_failure(app, 'clipboard verification mismatch')
+
+    def _restore_clipboard(self, pending: PendingRestore) -> None:
+        """Deferred restore; skipped when something else was copied after our paste"""
         try:
-            self.is_replacing = True
-            current_time = time.time()
-            if current_time - self.last_replacement_time < self.min_replacement_interval:
-                self.logger.debug("Skipping replacement - too soon after last replacement")
+            if pending.sequence is not None and self.backend.clipboard.sequence_number() != pending.sequence:
+                self.clipboard_cache = None
+                self.logger.debug("Clipboard changed since paste; not restoring")
+                return
+            restore_retries = self.restore_retries
+            started = time.perf_counter_ns()
+            restored = self.restore_clipboard(pending.text)
+            self.latency.record('clipboard_restore', started)
+            if not self.timing:
                 return
+            if self.restore_retries > restore_retries:
+                # The target still held the clipboard open reading our paste
+                self.timing.record_failure(pending.app, 'clipboard restore race')
+            elif restored and pending.pasted and pending.sequence is not None \
+                    and time.monotonic() >= pending.due:
+                # Nothing replaced the replacement for the whole paste window and the
+                # target had let go of the clipboard: it can only have pasted our text
+                self.timing.record_success(pending.app)
+        except Exception as e:
+            self.logger.error(f"Deferred clipboard restore failed: {e}")
+
+    def uses_direct_typing(self, replacement: str) -> bool:
+        """Short replacements are typed as Unicode key events instead of pasted"""
+        return len(replacement) <= self.direct_typing_max()
+
+    def type_replacement(self, word_length: int, replacement: str, timing: TimingProfile) -> None:
+        """Erase the typed word and type the replacement; never touches the clipboard"""
+        started = time.perf_counter_ns()
+        self.expect_echoes(['backspace'] * word_length + ['enter'] * replacement.count('\n'))
+        if timing.backspace <= Config.COMBINED_INJECTION_MAX_DELAY:
+            self.backend.injector.send_backspaces_and_text(word_length, replacement)
+        else:
+            self.backend.injector.send_backspaces(word_length)
+            time.sleep(timing.backspace)
+            self.backend.injector.type_text(replacement)
+        self.latency.record('type_text', started)
+
+    def paste_replacement(self, word_length: int, replacement: str,
+                          timing: TimingProfile, app: Optional[str]) -> None:
+        """Erase the typed word and paste the replacement through the clipboard"""
+        with self.clipboard_lock:
+            succeeded = False
+            sequence = None
+            mismatches = self.clipboard_mismatches
+            # A restore still pending from the last expansion already holds the original,
+            # unless the user copied something since; then that copy is the original
+            pending = self.clipboard_restore.take()
+            if pending is not None and pending.sequence is not None \
+                    and self.backend.clipboard.sequence_number() != pending.sequence:
+                self.logger.debug("Clipboard changed since the last paste; dropping its restore")
+                pending = None
+            original_clipboard = pending.text if pending else None
             try:
-                with self.clipboard_lock:
-                    original_clipboard = None
-                    clipboard_restored = False
-                    try:
-                        try:
-                            win32clipboard.CloseClipboard()
-                        except:
-                            pass
-                        max_attempts = self.clipboard_retry_count
-                        base_delay = self.clipboard_base_delay
-                        for attempt in range(max_attempts):
-                            try:
-                                if attempt > 0:
-                                    time.sleep(base_delay * (2 ** attempt))
-                                win32clipboard.OpenClipboard(None)
-                                if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
-                                    original_clipboard = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
-                                win32clipboard.CloseClipboard()
-                                break
-                            except Exception as e:
-                                self.logger.warning(f"Clipboard read attempt {attempt + 1} failed: {e}")
-                                try:
-                                    win32clipboard.CloseClipboard()
-                                except:
-                                    pass
-                                if attempt == max_attempts - 1:
-                                    raise TextReplacerError("Failed to access clipboard")
-                        for attempt in range(max_attempts):
-                            try:
-                                if attempt > 0:
-                                    time.sleep(base_delay * (2 ** attempt))
-                                win32clipboard.OpenClipboard(None)
-                                win32clipboard.EmptyClipboard()
-                                win32clipboard.SetClipboardText(replacement, win32con.CF_UNICODETEXT)
-                                win32clipboard.CloseClipboard()
-                                verify_text = self.get_clipboard_text()
-                                if verify_text == replacement:
-                                    break
-                                self.logger.warning(f"Clipboard verification failed on attempt {attempt + 1}")
-                            except Exception as e:
-                                self.logger.warning(f"Clipboard write attempt {attempt + 1} failed: {e}")
-                                try:
-                                    win32clipboard.CloseClipboard()
-                                except:
-                                    pass
-                                if attempt == max_attempts - 1:
-                                    raise TextReplacerError("Failed to set clipboard content")
-                        time.sleep(self.replacement_delay)
-                        word_length = len(typed_word) + 1
-                        backspace_inputs = []
-                        for _ in range(word_length):
-                            backspace_inputs.extend([
-                                self.create_input_structure(self.vk_map['backspace']),
-                                self.create_input_structure(self.vk_map['backspace'], KEYEVENTF_KEYUP)
-                            ])
-                        self.send_virtual_input(backspace_inputs)
-                        time.sleep(self.backspace_delay)
-                        paste_inputs = [
-                            self.create_input_structure(self.vk_map['ctrl']),
-                            self.create_input_structure(self.vk_map['v']),
-                            self.create_input_structure(self.vk_map['v'], KEYEVENTF_KEYUP),
-                            self.create_input_structure(self.vk_map['ctrl'], KEYEVENTF_KEYUP)
-                        ]
-                        time.sleep(self.paste_delay)
-                        self.send_virtual_input(paste_inputs)
-                        time.sleep(self.paste_delay)
-                        self.last_replacement_time = time.time()
-                        self.last_successful_replacement = time.time()
-                        self.service_healthy = True
-                    finally:
-                        if original_clipboard is not None and not clipboard_restored:
-                            for attempt in range(max_attempts):
-                                try:
-                                    if attempt > 0:
-                                        time.sleep(base_delay * (2 ** attempt))
-                                    win32clipboard.OpenClipboard(None)
-                                    win32clipboard.EmptyClipboard()
-                                    win32clipboard.SetClipboardText(original_clipboard, win32con.CF_UNICODETEXT)
-                                    win32clipboard.CloseClipboard()
-                                    clipboard_restored = True
-                                    break
-                                except Exception as e:
-                                    self.logger.warning(f"Clipboard restore attempt {attempt + 1} failed: {e}")
-                                    try:
-                                        win32clipboard.CloseClipboard()
-                                    except:
-                                        pass
-                                    if attempt == max_attempts - 1:
-                                        self.logger.error("Failed to restore clipboard")
-                    self.logger.info(f"Replaced '{typed_word}'")
-                    if self.on_replacement:
-                        self.executor.submit(self.on_replacement, typed_word, replacement)
+                if pending is None:
+                    original_clipboard = self.capture_clipboard()
+                self.set_clipboard_text(replacement)
+                sequence = self.backend.clipboard.sequence_number()
+                mark = time.perf_counter_ns()
+                time.sleep(timing.settle)
+                mark = self.latency.record('settle_delay', mark)
+                self.expect_echoes(['backspace'] * word_length + ['ctrl', 'v'])
+                if timing.backspace + timing.paste <= Config.COMBINED_INJECTION_MAX_DELAY:
+                    self.backend.injector.send_backspaces_and_paste(word_length)
+                    self.latency.record('backspaces_and_paste', mark)
+                else:
+                    self.backend.injector.send_backspaces(word_length)
+                    mark = self.latency.record('backspaces', mark)
+                    time.sleep(timing.backspace)
+                    time.sleep(timing.paste)
+                    mark = self.latency.record('pre_paste_delay', mark)
+                    self.backend.injector.send_paste()
+                    self.latency.record('paste', mark)
+                succeeded = True
+            finally:
+                if original_clipboard is not None:
+                    # The target reads the clipboard after the paste keystroke; restore once it has
+                    self.clipboard_restore.schedule(
+                        original_clipboard, sequence, self.clipboard_restore_delay if succeeded else 0, app,
+                        pasted=succeeded
+                    )
+                self.record_timing_outcome(app, succeeded, mismatches)
+
+    def perform_replacement(self, prepared: PreparedExpansion) -> None:
+        """Erase the typed characters that change and send the rest of the replacement"""
+        typed_word = prepared.typed_word
+        direct = prepared.direct
+        try:
+            self.is_replacing = True
+            app = self.backend.injector.foreground_app()
+            timing = self.get_timing(app)
+            # Only pastes can race each other on the clipboard; wait rather than drop
+            wait = self.last_replacement_time + timing.interval - time.time()
+            if not direct and wait > 0:
+                self.expansions_deferred += 1
+                time.sleep(wait)
+            started = time.perf_counter_ns()
+            try:
+                if direct:
+                    self.type_replacement(prepared.backspaces, prepared.payload, timing)
+                else:
+                    self.paste_replacement(prepared.backspaces, prepared.payload, timing, app)
+                self.last_replacement_time = time.time()
+                self.last_successful_replacement = time.time()
+                self.service_healthy = True
+                self.expansions_completed += 1
+                self.logger.info(f"Replaced '{typed_word}'")
+                if self.on_replacement and self.executor:
+                    self.executor.submit(self.on_replacement, typed_word, prepared.replacement)
             except Exception as e:
                 self.logger.error(f"Replacement failed: {e}")
-                raise TextReplacerError(f"Replacement failed: {str(e)}")
+                raise TextReplacerError(f"Replacement failed: {str(e)}") from e
+            finally:
+                self.latency.record('total', started)
         finally:
             self.is_replacing = False
-            self.typed_buffer.clear()
 
     def load_replacements(self):
         try:
-            from services.database import DatabaseManager
-            db = DatabaseManager()
             with self.replacements_lock:
-                self.replacements_cache.clear()
-                self.credentials_cache.clear()
-                self.words_to_replace = db.get_shortcuts_dict()
-                self.word_prefixes = set()
-                for keyword in self.words_to_replace:
-                    if self.validate_input(keyword, is_shortcut=True):
-                        current_word = []
-                        for char in keyword:
-                            current_word.append(char)
-                            self.word_prefixes.add(''.join(current_word))
-                for keyword, replacement in self.words_to_replace.items():
-                    if self.validate_input(replacement):
-                        self.replacements_cache.set(keyword, replacement)
-                self.credential_keywords = {k for k in self.words_to_replace if k.startswith("@")}
-                self.logger.info(f"Loaded {len(self.words_to_replace)} shortcuts")
-                self.logger.debug(f"Cached {len(self.replacements_cache.cache)} replacements")
+                shortcuts = self.db.get_shortcuts_dict()
+                index = ShortcutIndex.build(
+                    shortcuts,
+                    self.db.get_service_shortcuts(),
+                    instant=self.instant_expand,
+                    validator=self.shortcut_problem,
+                    direct_typing_max=self.direct_typing_max(),
+                )
+                self.report_rejected(index.rejected)
+                if index.shadowed:
+                    self.logger.warning(f"{len(index.shadowed)} shortcuts are shadowed in instant mode")
+                for shadowed in index.shadowed:
+                    self.logger.debug(
+                        f"Shortcut '{shadowed.keyword}' is {shadowed.reason} "
+                        f"(shadowed by '{shadowed.shadowed_by}')"
+                    )
+                self.index = index
+                self.credential_rotation.prefetch(set(index.services.values()))
+                self.logger.info(
+                    f"Loaded {len(index.records) - len(index.rejected)} shortcuts, "
+                    f"{len(index.services)} of them service triggers"
+                )
         except Exception as e:
             self.logger.error(f"Failed to load replacements: {str(e)}")
             raise TextReplacerError(f"Failed to load replacements: {str(e)}")
 
 
+    def report_rejected(self, rejected: Mapping[str, str]) -> None:
+        """One warning for every shortcut that failed validation, grouped by reason"""
+        if not rejected:
+            return
+        by_reason: Dict[str, List[str]] = {}
+        for keyword, reason in rejected.items():
+            by_reason.setdefault(reason, []).append(keyword)
+        details = "; ".join(
+            f"{reason}: {', '.join(sorted(keywords)[:5])}{' ...' if len(keywords) > 5 else ''}"
+            for reason, keywords in by_reason.items()
+        )
+        self.logger.warning(f"Rejected {len(rejected)} invalid shortcuts ({details})")
+
+    def set_instant_expand(self, enabled: bool) -> None:
+        if enabled == self.instant_expand:
+            return
+        self.instant_expand = enabled
+        self.load_replacements()
+        self.logger.info(f"Instant expand {'enabled' if enabled else 'disabled'}")
+
+    def upsert_shortcut(self, keyword: str, replacement: str) -> None:
+        self.apply_changes({keyword: replacement})
+
+    def remove_shortcut(self, keyword: str) -> None:
+        self.apply_changes({keyword: None})
+
+    def apply_changes(self, changes: Mapping[str, Optional[str]]) -> None:
+        """Patch already-saved shortcut changes into the live index without unhooking"""
+        if not changes:
+            return
+        try:
+            with self.replacements_lock:
+                index = self.index.with_changes(changes)
+                self.report_rejected({k: r for k, r in index.rejected.items() if k in changes})
+                self.index = index
+            self.logger.info(f"Applied {len(changes)} shortcut changes")
+        except Exception as e:
+            self.logger.error(f"Failed to apply shortcut changes: {str(e)}")
+            raise TextReplacerError(f"Failed to apply shortcut changes: {str(e)}")
+
+    def reload_services(self) -> None:
+        """Make service triggers match the services table without rebuilding the index"""
+        try:
+            with self.replacements_lock:
+                index = self.index.with_services(self.db.get_service_shortcuts())
+                self.report_rejected({k: r for k, r in index.rejected.items() if k in index.services})
+                self.index = index
+                self.credential_rotation.prefetch(set(index.services.values()))
+            self.logger.info(f"Loaded {len(index.services)} service triggers")
+        except Exception as e:
+            self.logger.error(f"Failed to reload services: {str(e)}")
+            raise TextReplacerError(f"Failed to reload services: {str(e)}")
+
     def reload_replacements(self):
-        was_running = self.is_running
-        if was_running:
-            self.stop()
-        self.replacements_cache.clear()
-        self.credentials_cache.clear()
+        """Full rebuild from the database; the hook and worker keep running"""
         self.load_replacements()
-        if was_running:
-            self.start()
 
     def start(self) -> None:
         if not self.is_running:
             try:
                 self.load_replacements()
-                if not self.words_to_replace:
+                if not self.index.records:
                     raise TextReplacerError("No replacements loaded")
                 self.is_running = True
                 self.service_healthy = True
+                self.health.reset()
+                self._stop_event = threading.Event()
+                # Fresh queues per start: workers of an earlier start that outlived stop()
+                # keep draining their own and can never consume this start's sentinel
+                self.replacement_queue = queue.Queue()
+                self.injection_queue = queue.Queue()
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=2)
+                self.credential_rotation.start()
                 self.start_health_monitoring()
+                self.start_resource_monitoring()
+                self.preparation_thread = threading.Thread(
+                    target=self.process_preparation_queue,
+                    args=(self.replacement_queue, self.injection_queue),
+                    daemon=True
+                )
+                self.preparation_thread.start()
                 self.replacement_thread = threading.Thread(
                     target=self.process_replacement_queue,
+                    args=(self.injection_queue, self._stop_event),
                     daemon=True
                 )
                 self.replacement_thread.start()
-                keyboard.hook(self.on_key_event)
+                self.request_cursor_reset()
+                self.backend.keys.hook(self.on_key_event)
                 self.logger.info("Text replacement service started successfully")
                 if self.on_status_change:
                     self.on_status_change(True)
@@ -642,13 +961,13 @@ class TextReplacer:
             try:
                 self.is_running = False
                 self.service_healthy = False
-                if self.health_check_thread and self.health_check_thread.is_alive():
-                    try:
-                        self.health_check_thread.join(timeout=1.0)
-                    except Exception as e:
-                        self.logger.error(f"Error stopping health monitor: {e}")
-                self.replacements_cache.clear()
-                self.credentials_cache.clear()
+                self._stop_event.set()
+                for task in (self.health_check_task, self.resource_check_task):
+                    if task:
+                        task.cancel()
+                self.health_check_task = self.resource_check_task = None
+                if self.timing:
+                    self.timing.save()
                 if self.executor:
                     try:
                         for future in self.get_pending_futures():
@@ -656,22 +975,28 @@ class TextReplacer:
                         self.executor.shutdown(wait=True, cancel_futures=True)
                     except Exception as e:
                         self.logger.error(f"Error shutting down executor: {e}")
+                    self.executor = None
                 if self.replacement_thread and self.replacement_thread.is_alive():
                     try:
-                        self.replacement_queue.put("STOP")
-                        self.replacement_thread.join(timeout=1.0)
+                        # Passes through both stages after any words already queued
+                        if self.preparation_thread and self.preparation_thread.is_alive():
+                            self.replacement_queue.put(_STOP)
+                        else:
+                            self.injection_queue.put(_STOP)
+                        for worker in (self.preparation_thread, self.replacement_thread):
+                            if worker and worker is not threading.current_thread():
+                                worker.join(timeout=1.0)
                     except Exception as e:
                         self.logger.error(f"Error stopping replacement thread: {e}")
-                keyboard.unhook_all()
+                self.backend.keys.unhook()
+                self.credential_rotation.stop()
+                self.clipboard_restore.stop()
                 try:
-                    foreground_window = self.user32.GetForegroundWindow()
-                    if foreground_window:
-                        target_thread = self.user32.GetWindowThreadProcessId(foreground_window, None)
-                        current_thread = self.kernel32.GetCurrentThreadId()
-                        self.user32.AttachThreadInput(current_thread, target_thread, False)
+                    self.backend.injector.detach()
                 except Exception as e:
                     self.logger.error(f"Failed to detach thread input: {e}")
-                self.typed_buffer.clear()
+                self.request_cursor_reset()
+                self._echoes.clear()
                 self.clipboard_cache = None
                 self.logger.info("Text replacement service stopped successfully")
                 if self.on_status_change:
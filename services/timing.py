@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+from typing import Dict, Optional
+from config import Config
+from utils.logger import Logger
+
+DEFAULT_APP = 'default'
+
+
+@dataclass
+class TimingProfile:
+    """Delays (seconds) one application needs around clipboard paste injection"""
+    settle: float = 0.05
+    backspace: float = 0.001
+    paste: float = 0.05
+    interval: float = 0.1
+    successes: int = 0
+    failures: int = 0
+    # Consecutive clean expansions required before shrinking again
+    patience: int = 0
+
+    def delays(self) -> Dict[str, float]:
+        return {'settle': self.settle, 'backspace': self.backspace,
+                'paste': self.paste, 'interval': self.interval}
+
+
+_DELAY_FIELDS = ('settle', 'backspace', 'paste', 'interval')
+
+
+class AdaptiveTimingController:
+    """Learns the smallest safe replacement delays per foreground application.
+
+    Delays start at the ceiling (the engine's historical constants) and shrink
+    geometrically toward per-delay floors after `patience` confirmed expansions
+    in a row. Only positive evidence counts as a success: the caller reports
+    one when the clipboard provably held the replacement until the target had
+    pasted. Any failure signal doubles the delays again and doubles the
+    patience, so applications that really need time settle at a stable value.
+    """
+
+    def __init__(self, ceiling: Optional[TimingProfile] = None,
+                 floors: Optional[Dict[str, float]] = None,
+                 path: Optional[Path] = None,
+                 shrink_after: int = Config.TIMING_SHRINK_AFTER,
+                 shrink_factor: float = 0.7,
+                 backoff_factor: float = 2.0,
+                 save_interval: float = 30.0):
+        self.ceiling = ceiling or TimingProfile()
+        self.floors = dict(Config.TIMING_FLOORS if floors is None else floors)
+        self.path = Path(path) if path else Config.get_data_path(Config.TIMING_PROFILE_FILE)
+        self.shrink_after = shrink_after
+        self.max_patience = shrink_after * 16
+        self.shrink_factor = shrink_factor
+        self.backoff_factor = backoff_factor
+        self.save_interval = save_interval
+        self.logger = Logger(__name__)
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, TimingProfile] = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.load()
+
+    def _floor_for(self, name: str) -> float:
+        return min(self.floors.get(name, 0.0), getattr(self.ceiling, name))
+
+    def _profile(self, app: Optional[str]) -> TimingProfile:
+        key = app or DEFAULT_APP
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = replace(self.ceiling, successes=0, failures=0, patience=self.shrink_after)
+            self._profiles[key] = profile
+        return profile
+
+    def profile(self, app: Optional[str]) -> TimingProfile:
+        """Copy of the delays to use for the given application"""
+        with self._lock:
+            return replace(self._profile(app))
+
+    def record_success(self, app: Optional[str]) -> None:
+        with self._lock:
+            profile = self._profile(app)
+            profile.successes += 1
+            if profile.successes >= profile.patience:
+                profile.successes = 0
+                for name in _DELAY_FIELDS:
+                    value = max(self._floor_for(name), getattr(profile, name) * self.shrink_factor)
+                    setattr(profile, name, value)
+                self._dirty = True
+        self._maybe_save()
+
+    def record_failure(self, app: Optional[str], reason: str) -> None:
+        with self._lock:
+            profile = self._profile(app)
+            profile.successes = 0
+            profile.failures += 1
+            profile.patience = min(self.max_patience, profile.patience * 2)
+            for name in _DELAY_FIELDS:
+                ceiling = getattr(self.ceiling, name)
+                value = max(self._floor_for(name), getattr(profile, name)) * self.backoff_factor
+                setattr(profile, name, min(ceiling, value))
+            self._dirty = True
+        self.logger.debug(f"Backing off replacement timing for {app or DEFAULT_APP}: {reason}")
+        self._maybe_save()
+
+    def _maybe_save(self) -> None:
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as handle:
+                stored = json.load(handle)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable timing profiles: {e}")
+            return
+        known = {f.name for f in fields(TimingProfile)}
+        with self._lock:
+            for app, values in stored.items():
+                profile = replace(self.ceiling, patience=self.shrink_after)
+                for name, value in values.items():
+                    if name in known:
+                        setattr(profile, name, type(getattr(profile, name))(value))
+                # Current ceilings and floors win over anything learned under older ones
+                for name in _DELAY_FIELDS:
+                    value = min(getattr(self.ceiling, name), getattr(profile, name))
+                    setattr(profile, name, max(self._floor_for(name), value))
+                self._profiles[app] = profile
+
+    def save(self) -> None:
+        with self._lock:
+            snapshot = {app: asdict(profile) for app, profile in self._profiles.items()}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix('.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as handle:
+                json.dump(snapshot, handle, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.logger.error(f"Failed to save timing profiles: {e}")
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {app: asdict(profile) for app, profile in self._profiles.items()}
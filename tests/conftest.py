@@ -0,0 +1,26 @@
+import pytest
+
+from config import Config
+from services.backends.synthetic import SyntheticBackend
+from services.database import DatabaseManager
+from services.scheduler import TaskScheduler
+from services.text_replacer import TextReplacer
+
+# Long enough to be pasted through the clipboard rather than typed
+LONG = 'x' * (Config.DIRECT_TYPING_MAX_LENGTH + 1)
+
+
+@pytest.fixture
+def replacer(tmp_path, monkeypatch):
+    """TextReplacer on the synthetic backend with two pasted shortcuts and its own scheduler"""
+    monkeypatch.setattr(Config, 'DATA_DIR', tmp_path)
+    monkeypatch.setattr(Config, 'DB_PATH', tmp_path / 'replacements.db')
+    db = DatabaseManager()
+    db.save_shortcut('3ailink', 'ai ' + LONG)
+    db.save_shortcut('3mmlink', 'mm ' + LONG)
+    scheduler = TaskScheduler('test')
+    scheduler.start()
+    replacer = TextReplacer(db, backend=SyntheticBackend('ORIG'), scheduler=scheduler)
+    yield replacer
+    scheduler.stop()
+    db.close()
@@ -0,0 +1,16 @@
+def test_back_to_back_pastes_restore_the_original_once(replacer):
+    clipboard = replacer.backend.clipboard
+    assert replacer.expand('3ailink')
+    assert replacer.expand('3mmlink')
+    replacer.clipboard_restore.flush()
+    assert clipboard.text == 'ORIG'
+    assert replacer.clipboard_restore.get_stats()['coalesced'] == 1
+
+
+def test_copy_between_pastes_is_kept(replacer):
+    clipboard = replacer.backend.clipboard
+    assert replacer.expand('3ailink')
+    clipboard.copy('USER COPIED THIS')
+    assert replacer.expand('3mmlink')
+    replacer.clipboard_restore.flush()
+    assert clipboard.text == 'USER COPIED THIS'
@@ -0,0 +1,102 @@
+import threading
+
+from services.credential_rotation import CredentialRotation
+from services.scheduler import TaskScheduler
+
+SERVICE = 1
+
+
+class FakeDatabase:
+    """Credential rows of one service with last_used tracking and a call log"""
+
+    def __init__(self, count):
+        self.rows = [(credential_id, f'user{credential_id}') for credential_id in range(1, count + 1)]
+        self.last_used = None
+        self.calls = []
+        self.load_gate = None
+        self.mark_gate = None
+        self.marking = threading.Event()
+
+    def get_credential_rotation(self, service_id):
+        self.calls.append('load')
+        if self.load_gate is not None:
+            self.load_gate.wait()
+        return list(self.rows), self.last_used
+
+    def mark_credentials_used(self, usages):
+        self.calls.append('mark')
+        self.marking.set()
+        if self.mark_gate is not None:
+            self.mark_gate.wait()
+        self.last_used = usages[-1][1]
+
+
+def make_rotation(db):
+    # Never started: scheduled refills and flushes stay queued unless a test runs them
+    return CredentialRotation(db, TaskScheduler('test'), prefetch_depth=4, low_water=1)
+
+
+def test_invalidate_persists_dispenses_before_the_reload():
+    db = FakeDatabase(6)
+    rotation = make_rotation(db)
+    taken = [rotation.take(SERVICE)[1] for _ in range(3)]
+    rotation.invalidate(SERVICE)
+    assert rotation.get_stats()['pending_writes'] == 0
+    assert db.calls == ['load', 'mark']
+    # The reload resumes right after the last credential handed out
+    assert taken == ['user1', 'user2', 'user3']
+    assert rotation.take(SERVICE)[1] == 'user4'
+
+
+def test_dispense_during_invalidate_is_not_handed_out_again():
+    db = FakeDatabase(6)
+    rotation = make_rotation(db)
+    taken = [rotation.take(SERVICE)[1]]
+    db.mark_gate = threading.Event()
+    invalidate = threading.Thread(target=rotation.invalidate, args=(SERVICE,))
+    invalidate.start()
+    assert db.marking.wait(1.0)
+    # A dispense racing the journal write has to wait for the reload
+    racing = threading.Thread(target=lambda: taken.append(rotation.take(SERVICE)[1]))
+    racing.start()
+    db.mark_gate.set()
+    invalidate.join(1.0)
+    racing.join(1.0)
+    taken.append(rotation.take(SERVICE)[1])
+    assert taken == ['user1', 'user2', 'user3']
+
+
+def test_usage_reset_drops_the_journal_instead_of_persisting_it():
+    db = FakeDatabase(3)
+    rotation = make_rotation(db)
+    rotation.take(SERVICE)
+    rotation.invalidate(SERVICE, usage_reset=True)
+    assert 'mark' not in db.calls
+    assert rotation.take(SERVICE)[1] == 'user1'
+
+
+def test_trim_persists_and_unloads():
+    db = FakeDatabase(3)
+    rotation = make_rotation(db)
+    rotation.take(SERVICE)
+    assert rotation.trim(0) > 0
+    assert db.calls == ['load', 'mark']
+    assert rotation.get_stats()['services_loaded'] == 0
+    assert rotation.take(SERVICE)[1] == 'user2'
+
+
+def test_refill_in_flight_during_trim_does_not_install_its_rows():
+    db = FakeDatabase(3)
+    rotation = make_rotation(db)
+    rotation.take(2)
+    db.load_gate = threading.Event()
+    refill = threading.Thread(target=rotation._refill, args=(SERVICE,))
+    refill.start()
+    while db.calls.count('load') < 2:
+        refill.join(0.001)
+    # Service 2 is unloaded while the refill of SERVICE is still reading the database
+    assert rotation.trim(0) > 0
+    db.load_gate.set()
+    refill.join(1.0)
+    assert rotation.get_stats()['services_loaded'] == 0
+    assert rotation.refills == 0
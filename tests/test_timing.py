@@ -0,0 +1,55 @@
+import json
+import time
+
+from config import Config
+from services.timing import AdaptiveTimingController, TimingProfile
+
+FLOORS = {'settle': 0.02, 'backspace': 0.001, 'paste': 0.004, 'interval': 0.05}
+CEILING = TimingProfile(settle=0.05, backspace=0.001, paste=0.05, interval=0.1)
+
+
+def test_successes_shrink_to_the_per_delay_floors(tmp_path):
+    timing = AdaptiveTimingController(CEILING, floors=FLOORS, path=tmp_path / 'timing.json', shrink_after=1)
+    for _ in range(100):
+        timing.record_success('app')
+    assert timing.profile('app').delays() == FLOORS
+
+
+def test_load_lifts_profiles_learned_below_the_floors(tmp_path):
+    path = tmp_path / 'timing.json'
+    path.write_text(json.dumps({'app': {'settle': 0.002, 'paste': 0.002, 'interval': 0.002}}))
+    timing = AdaptiveTimingController(CEILING, floors=FLOORS, path=path)
+    assert timing.profile('app').delays() == FLOORS
+
+
+def wait_for_restore(replacer):
+    deadline = time.monotonic() + 2
+    while replacer.clipboard_restore.get_stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_only_confirmed_pastes_shrink_the_delays(replacer):
+    replacer.clipboard_restore_delay = 10
+    replacer.timing.shrink_after = 1
+    ceiling = replacer.timing.profile(None).delays()
+    # Back-to-back pastes take over each other's restore, and a restore forced before
+    # its paste window is over confirms nothing
+    for _ in range(Config.TIMING_SHRINK_AFTER * 2):
+        assert replacer.expand('3ailink')
+    replacer.clipboard_restore.flush()
+    assert replacer.timing.profile(None).delays() == ceiling
+    replacer.clipboard_restore_delay = 0.05
+    assert replacer.expand('3ailink')
+    wait_for_restore(replacer)
+    assert replacer.timing.profile(None).settle < ceiling['settle']
+
+
+def test_paste_overwritten_before_restore_is_not_credited(replacer):
+    replacer.clipboard_restore_delay = 0.05
+    replacer.timing.shrink_after = 1
+    ceiling = replacer.timing.profile(None).delays()
+    assert replacer.expand('3ailink')
+    replacer.backend.clipboard.copy('USER COPIED THIS')
+    wait_for_restore(replacer)
+    assert replacer.timing.profile(None).delays() == ceiling
+    assert replacer.backend.clipboard.text == 'USER COPIED THIS'
@@ -0,0 +1,122 @@
+import queue
+import threading
+import types
+
+import pytest
+
+from services.backends.base import BackendError
+from services.backends.win32 import WM_USER, Win32KeyEventSource
+
+WM_QUIT = 0x0012
+
+
+class FakeUser32:
+    """Per-thread message queues standing in for PostThreadMessageW/GetMessage"""
+
+    def __init__(self):
+        self.queues = {}
+        self.posted = []
+
+    def PostThreadMessageW(self, thread_id, message, wparam, lparam):
+        self.posted.append(message)
+        if thread_id not in self.queues:
+            return 0
+        self.queues[thread_id].put(message)
+        return 1
+
+    def GetMessage(self):
+        # Returns 0 only for WM_QUIT, like the Win32 call
+        return 0 if self.queues[threading.get_native_id()].get() == WM_QUIT else 1
+
+
+class FakeListener:
+    """keyboard._listener with the library's `while not GetMessage(...)` loop"""
+
+    def __init__(self, user32, responsive=True):
+        self.lock = threading.Lock()
+        self.listening = True
+        self.listening_thread = None
+        self.user32 = user32
+        self.responsive = responsive
+        self.hooks_installed = 0
+        self.ready = threading.Event()
+        self.release = threading.Event()
+
+    def listen(self):
+        self.user32.queues[threading.get_native_id()] = queue.Queue()
+        self.hooks_installed += 1
+        self.ready.set()
+        if not self.responsive:
+            self.release.wait()
+            return
+        while not self.user32.GetMessage():
+            pass
+
+    def start(self):
+        self.ready.clear()
+        self.listening_thread = threading.Thread(target=self.listen, daemon=True)
+        self.listening_thread.start()
+        assert self.ready.wait(1.0)
+
+
+def make_source(listener, user32):
+    source = Win32KeyEventSource.__new__(Win32KeyEventSource)
+    source._keyboard = types.SimpleNamespace(_listener=listener)
+    source.user32 = user32
+    return source
+
+
+def test_reinstall_replaces_the_listener_thread():
+    user32 = FakeUser32()
+    listener = FakeListener(user32)
+    listener.start()
+    old = listener.listening_thread
+    listener.ready.clear()
+
+    make_source(listener, user32).reinstall()
+
+    assert not old.is_alive()
+    assert listener.ready.wait(1.0)
+    assert listener.listening_thread is not old
+    assert listener.listening_thread.is_alive()
+    assert listener.hooks_installed == 2
+    assert user32.posted == [WM_USER]
+    user32.PostThreadMessageW(listener.listening_thread.native_id, WM_USER, 0, 0)
+    listener.listening_thread.join(1.0)
+
+
+def test_wm_quit_does_not_end_the_library_loop():
+    user32 = FakeUser32()
+    listener = FakeListener(user32)
+    listener.start()
+    thread = listener.listening_thread
+    user32.PostThreadMessageW(thread.native_id, WM_QUIT, 0, 0)
+    thread.join(0.2)
+    assert thread.is_alive()
+    user32.PostThreadMessageW(thread.native_id, WM_USER, 0, 0)
+    thread.join(1.0)
+    assert not thread.is_alive()
+
+
+def test_reinstall_raises_while_the_old_thread_is_alive():
+    user32 = FakeUser32()
+    listener = FakeListener(user32, responsive=False)
+    listener.start()
+    old = listener.listening_thread
+
+    with pytest.raises(BackendError):
+        make_source(listener, user32).reinstall()
+
+    # No second listener, and so no second hook, next to the stuck one
+    assert listener.listening_thread is old
+    assert listener.hooks_installed == 1
+    listener.release.set()
+
+
+def test_reinstall_does_nothing_before_listening():
+    user32 = FakeUser32()
+    listener = FakeListener(user32)
+    listener.listening = False
+    make_source(listener, user32).reinstall()
+    assert listener.listening_thread is None
+    assert user32.posted == []
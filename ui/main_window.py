@@ -58,7 +58,6 @@ class MainWindow:
             if hasattr(self.sidebar, 'cred_status'):
                 self.sidebar.cred_status.configure(text="No credentials loaded")
                 
-            self.text_replacer.reload_replacements()
             show_info("Success", "All credentials have been cleared.")
         except Exception as e:
             show_error("Error", f"Failed to clear credentials: {str(e)}")
@@ -218,7 +217,6 @@ class MainWindow:
                 progress.destroy()
                 
                 # Update UI
-                self.text_replacer.reload_replacements()
                 self.update_credential_list()
                 
                 show_info(
@@ -312,26 +310,13 @@ class MainWindow:
         try:
             if not self.text_replacer:
                 return
-            was_running = self.text_replacer.is_running
-            if was_running:
-                self.text_replacer.stop()
-            with self.text_replacer.replacements_lock:
-                self.text_replacer.typed_buffer.clear()
-                self.text_replacer.clipboard_cache = None
-                self.text_replacer.word_prefixes.clear()
-                self.text_replacer.words_to_replace.clear()
-                self.text_replacer.credential_keywords.clear()
-                self.text_replacer.replacement_cache.clear()
-            self.text_replacer.load_replacements()
-            if was_running:
-                self.text_replacer.start()
+            self.text_replacer.clear_caches()
+            self.text_replacer.reload_replacements()
             self.reload_shortcuts()
             self.update_credential_list()
             show_info("Success", "All caches cleared and data reloaded!")
         except Exception as e:
             show_error("Error", f"Failed to clear caches: {str(e)}")
-            if was_running and not self.text_replacer.is_running:
-                self.text_replacer.start()
     def load_initial_data(self):
         try:
             self.reload_shortcuts()
@@ -361,7 +346,7 @@ class MainWindow:
                 return False
             shortcut, content = shortcut_data
             self.db_manager.save_shortcut(shortcut, content)
-            self.text_replacer.reload_replacements()
+            self.text_replacer.upsert_shortcut(shortcut, content)
             self.reload_shortcuts()
             show_info("Success", "Shortcut saved successfully!")
             return True
@@ -455,7 +440,6 @@ class MainWindow:
                 return
                 
             self.db_manager.delete_credential(int(credential_id))
-            self.text_replacer.reload_replacements()
             self.update_credential_list()
             show_info("Success", "Credential deleted successfully!")
         except Exception as e:
@@ -471,7 +455,7 @@ class MainWindow:
             return False
         try:
             self.db_manager.delete_shortcut(current_shortcut[0])
-            self.text_replacer.reload_replacements()
+            self.text_replacer.remove_shortcut(current_shortcut[0])
             self.reload_shortcuts()
             self.mainbar.clear_fields()
             show_info("Success", "Shortcut deleted successfully!")
@@ -47,13 +47,13 @@ def throttle(delay: float) -> Callable:
     return decorator
 
 def async_operation(func: Callable) -> Callable:
-    """Decorator to run function asynchronously"""
+    """Decorator to run function on the shared scheduler's background pool; returns the task"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        from threading import Thread
-        thread = Thread(target=func, args=args, kwargs=kwargs, daemon=True)
-        thread.start()
-        return thread
+        from services.scheduler import shared_scheduler
+        return shared_scheduler().call_later(
+            0, functools.partial(func, *args, **kwargs), name=func.__qualname__, background=True
+        )
     return wrapper
 
 def measure_time(func: Callable) -> Callable:
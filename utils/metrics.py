@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) histogram of nanosecond latencies.
+
+    Values below 2**significant_bits are counted exactly; above that each
+    power of two is split into 2**(significant_bits - 1) buckets, so every
+    recorded value is kept to within 1 / 2**(significant_bits - 1) of itself.
+    """
+
+    def __init__(self, significant_bits: int = 7):
+        self.significant_bits = significant_bits
+        self._half = 1 << (significant_bits - 1)
+        self._exact_limit = 1 << significant_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self._exact_limit:
+            return value
+        shift = value.bit_length() - self.significant_bits
+        return self._exact_limit + (shift - 1) * self._half + ((value >> shift) - self._half)
+
+    def _lower_bound(self, index: int) -> int:
+        if index < self._exact_limit:
+            return index
+        shift, offset = divmod(index - self._exact_limit, self._half)
+        return (self._half + offset) << (shift + 1)
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, fraction: float) -> int:
+        """Lowest bucket value at or below which `fraction` of samples fall"""
+        if not self.count:
+            return 0
+        target = max(1, int(round(fraction * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(self._lower_bound(index), self.min), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self) -> None:
+        self.counts.clear()
+        self.count = self.total = self.min = self.max = 0
+
+    def summary(self) -> Dict[str, float]:
+        """Count plus min/mean/p50/p90/p99/max in milliseconds"""
+        return {
+            'count': self.count,
+            'min_ms': self.min / 1e6,
+            'mean_ms': self.mean() / 1e6,
+            'p50_ms': self.percentile(0.50) / 1e6,
+            'p90_ms': self.percentile(0.90) / 1e6,
+            'p99_ms': self.percentile(0.99) / 1e6,
+            'max_ms': self.max / 1e6,
+        }
+
+
+class LatencyRecorder:
+    """Named latency histograms fed from perf_counter_ns spans"""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, started_ns: int, ended_ns: Optional[int] = None) -> int:
+        """Record the span since started_ns and return its end for chaining"""
+        if ended_ns is None:
+            ended_ns = time.perf_counter_ns()
+        with self._lock:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = LatencyHistogram()
+            histogram.record(ended_ns - started_ns)
+        return ended_ns
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {phase: histogram.summary() for phase, histogram in self.histograms.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+
+    def dump(self, path: str) -> None:
+        """Write the per-phase summary as JSON"""
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(self.summary(), handle, indent=2)
+
+
+class CallbackWatchdog:
+    """Keeps count of callbacks that overran a time budget and their latest durations"""
+
+    __slots__ = ('budget_ns', 'overruns', 'max_ns', 'recent', '_next')
+
+    def __init__(self, budget_ns: int, keep: int = 16):
+        self.budget_ns = budget_ns
+        self.overruns = 0
+        self.max_ns = 0
+        self.recent: List[int] = [0] * keep
+        self._next = 0
+
+    def record(self, elapsed_ns: int) -> None:
+        self.overruns += 1
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.recent[self._next] = elapsed_ns
+        self._next = (self._next + 1) % len(self.recent)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'budget_us': self.budget_ns / 1000,
+            'overruns': self.overruns,
+            'max_us': self.max_ns / 1000,
+            'recent_us': [elapsed / 1000 for elapsed in self.recent if elapsed],
+        }